@@ -1,48 +1,621 @@
 import os
+import sys
+import csv
 import glob
 import time
-import pytz
+import types
+import argparse
+import cProfile
+import functools
+import importlib
+import importlib.util
+import threading
+import contextlib
+import tracemalloc
+import collections
 import json
-import requests
-import pandas as pd
+import hashlib
+import codecs
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from urllib.parse import urljoin
-from bs4 import BeautifulSoup
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font
+from urllib.parse import urljoin, urlparse
 from pathlib import Path
 
+class LazyModule(types.ModuleType):
+    # Imports the real module on first attribute access; importlib's per-module locks keep this safe
+    # from the prefetch threads, unlike importlib.util.LazyLoader on Python 3.11.
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self.__name__), attribute)
 
-def download_latest_csv(url, download_path):
-    response = requests.get(url)
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name.partition('.')[0]) is None:
+        return None
+    return LazyModule(name)
+
+pd = lazy_import('pandas')
+bs4 = lazy_import('bs4')
+pytz = lazy_import('pytz')
+urllib3 = lazy_import('urllib3')
+sqlite3 = lazy_import('sqlite3')
+requests = lazy_import('requests')
+openpyxl = lazy_import('openpyxl')
+openpyxl_rule = lazy_import('openpyxl.formatting.rule')
+lxml_html = lazy_import('lxml.html')
+yaml = lazy_import('yaml')
+ijson = lazy_import('ijson')
+pa = lazy_import('pyarrow')
+pq = lazy_import('pyarrow.parquet')
+
+EXPORT_INDEX_URL = "https://vcwarchive.g.comcast.net/vcwh_exports/ppv/"
+MERLIN_INSPECTOR_URL = "http://inspector.merlin.comcast.net:8080"
+OFFER_URL = "http://bo.prod.merlin.ccp.xcal.tv:9023/offerDataService/data/Offer"
+OFFER_PARAMS = {
+    "schema": "2.34.0",
+    "form": "cjson",
+}
+OFFER_PAGE_SIZE = 100
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+HTTP_TIMEOUT = (5, 30)
+HTTP_RETRIES = 3
+HTTP_LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000)
+
+TierConfig = collections.namedtuple('TierConfig', ['label', 'source_id', 'grid_under'])
+DEFAULT_TIERS = (
+    TierConfig('HD', '13503', 'grid-under-504'),
+    TierConfig('SD', '12162', 'grid-under-501'),
+    TierConfig('ES', '15006', 'grid-under-502'),
+)
+TIERS_FILENAME = 'tiers.json'
+TIER_CONFIGS = list(DEFAULT_TIERS)
+TIERS = [tier.label for tier in DEFAULT_TIERS]
+TIER_SOURCE_IDS = {tier.label: tier.source_id for tier in DEFAULT_TIERS}
+GRID_TIERS = {tier.grid_under: tier.label for tier in DEFAULT_TIERS}
+
+SOURCE_ID_COLUMN = 'Source Id'
+BILLING_EVENT_ID_COLUMN = 'Billing Event Id'
+CORP_CODE_COLUMN = 'Corp'
+# Tier rows are selected and diffed by header name; the column letters below only place the checks and styling
+EXPORT_KEY_COLUMNS = (BILLING_EVENT_ID_COLUMN, SOURCE_ID_COLUMN, CORP_CODE_COLUMN)
+BILLING_COLUMN = 'H'
+PRICE_COLUMN = 'I'
+CORP_COLUMN = 'J'
+DATE_COLUMN = 'K'
+CHECK_COLUMNS = {
+    BILLING_COLUMN: 'billing_ok',
+    PRICE_COLUMN: 'price_ok',
+    DATE_COLUMN: 'date_ok',
+    CORP_COLUMN: 'corp_ok',
+}
+EXCLUDED_CORP_PREFIXES = ('8069', '8045')
+CORP_TAG_PREFIX = 'Corp:'
+GOOD_STYLE = 'PPV Good'
+BAD_STYLE = 'PPV Bad'
+STYLE_COLORS = {
+    GOOD_STYLE: ('006100', 'C6EFCE'),
+    BAD_STYLE: ('9C0006', 'FFC7CE'),
+}
+EXPORT_CACHE_INDEX = 'export_cache.json'
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = (10, 60)
+COLUMNAR_CACHE_DIR = 'export_cache'
+MASTER_CORP_FILENAME = 'MasterCorp.xlsx'
+HISTORY_DB_FILENAME = 'ppv_history.sqlite3'
+HISTORY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    event_name TEXT NOT NULL,
+    export TEXT,
+    file_number TEXT,
+    broadcast_date TEXT,
+    broadcast_time TEXT,
+    date_to_match TEXT,
+    validated_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    workbook TEXT,
+    stages TEXT
+);
+CREATE TABLE IF NOT EXISTS tier_results (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    tier TEXT NOT NULL,
+    billing_id TEXT,
+    price TEXT,
+    media_guid TEXT,
+    listing_ids TEXT,
+    program_ids TEXT,
+    station_ids TEXT,
+    channel_ids TEXT,
+    rows INTEGER,
+    billing_failures INTEGER,
+    price_failures INTEGER,
+    date_failures INTEGER,
+    corp_failures INTEGER,
+    matched_availabilities INTEGER,
+    missing_in_merlin INTEGER,
+    unexpected_in_merlin INTEGER,
+    PRIMARY KEY (run_id, tier)
+);
+CREATE TABLE IF NOT EXISTS row_results (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    tier TEXT NOT NULL,
+    row INTEGER,
+    source_id TEXT,
+    corp INTEGER,
+    billing_id TEXT,
+    price REAL,
+    start_date TEXT,
+    billing_ok INTEGER,
+    price_ok INTEGER,
+    date_ok INTEGER,
+    corp_ok INTEGER
+);
+CREATE TABLE IF NOT EXISTS availability_diffs (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    tier TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_event ON runs (event_name, validated_at);
+CREATE INDEX IF NOT EXISTS runs_workbook ON runs (workbook);
+CREATE INDEX IF NOT EXISTS tier_results_tier ON tier_results (tier, run_id);
+CREATE INDEX IF NOT EXISTS row_results_run ON row_results (run_id, tier);
+CREATE INDEX IF NOT EXISTS row_results_corp ON row_results (corp);
+CREATE INDEX IF NOT EXISTS availability_diffs_run ON availability_diffs (run_id, tier);
+'''
+HISTORY_CHECKS = ('billing', 'price', 'date', 'corp')
+HISTORY_FILTERS = '''
+    (:event_name IS NULL OR runs.event_name LIKE :event_name)
+    AND (:tier IS NULL OR {table}.tier = :tier)
+    AND (:since IS NULL OR runs.validated_at >= :since)
+'''
+HISTORY_TIMELINE_QUERY = '''
+SELECT runs.run_id, runs.validated_at, runs.export, runs.event_name, tier_results.tier, tier_results.billing_id,
+       tier_results.price, tier_results.rows, tier_results.billing_failures, tier_results.price_failures,
+       tier_results.date_failures, tier_results.corp_failures, tier_results.missing_in_merlin,
+       tier_results.unexpected_in_merlin, runs.source
+FROM tier_results JOIN runs ON runs.run_id = tier_results.run_id
+WHERE''' + HISTORY_FILTERS.format(table='tier_results') + '''
+ORDER BY runs.validated_at, runs.run_id
+'''
+HISTORY_CORP_QUERY = '''
+SELECT runs.run_id, runs.validated_at, runs.export, runs.event_name, row_results.tier, row_results.row,
+       row_results.billing_id, row_results.price, row_results.start_date, row_results.billing_ok,
+       row_results.price_ok, row_results.date_ok, row_results.corp_ok
+FROM row_results JOIN runs ON runs.run_id = row_results.run_id
+WHERE row_results.corp = :corp AND''' + HISTORY_FILTERS.format(table='row_results') + '''
+ORDER BY runs.validated_at DESC, runs.run_id DESC
+LIMIT :limit
+'''
+MASTER_CORP_INDEX_SUFFIX = '.index.json'
+WATCH_STATE_FILENAME = 'watch_state.json'
+RESPONSE_CACHE_DIR = 'response_cache'
+RESPONSE_CACHE_TTL = 10 * 60
+RESPONSE_CACHE_MAX_ENTRIES = 512
+RESPONSE_CACHE_FIELDS = frozenset(('url', 'params', 'status_code', 'text', 'fetched_at'))
+WATCH_MIN_INTERVAL = 60
+WATCH_MAX_INTERVAL = 15 * 60
+
+TierListings = collections.namedtuple('TierListings', ['listing_ids', 'program_ids', 'station_ids', 'channel_ids'])
+MasterCorp = collections.namedtuple('MasterCorp', ['corp_values', 'corp_codes', 'availability_rows'])
+TierLayout = collections.namedtuple('TierLayout', ['width', 'last_data_row', 'reference_row', 'last_reference_row'])
+
+run_report = {'started': time.time(), 'stages': [], 'http': {}}
+run_report_lock = threading.Lock()
+response_cache = {'path': None, 'ttl': RESPONSE_CACHE_TTL, 'max_entries': RESPONSE_CACHE_MAX_ENTRIES,
+                  'refresh': False, 'record': False, 'replay': False}
+open_memory_stages = []
+
+
+def fold_memory_peak():
+    peak = tracemalloc.get_traced_memory()[1]
+    for record in open_memory_stages:
+        record['peak_memory_bytes'] = max(record.get('peak_memory_bytes', 0), peak)
+    run_report['peak_memory_bytes'] = max(run_report.get('peak_memory_bytes', 0), peak)
+
+def reset_run_report():
+    with run_report_lock:
+        run_report.clear()
+        run_report.update(started=time.time(), stages=[], http={})
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+@contextlib.contextmanager
+def stage(name):
+    record = {'name': name, 'thread': threading.current_thread().name}
+    track_memory = tracemalloc.is_tracing() and threading.current_thread() is threading.main_thread()
+    if track_memory:
+        fold_memory_peak()
+        tracemalloc.reset_peak()
+        open_memory_stages.append(record)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 6)
+        if track_memory:
+            fold_memory_peak()
+            open_memory_stages.remove(record)
+        with run_report_lock:
+            run_report['stages'].append(record)
+
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def http_endpoint(url):
+    path = urlparse(url).path
+    if path.endswith('.csv'):
+        path = path.rsplit('/', 1)[0] + '/*.csv'
+    return path
+
+def record_http_latency(response, *args, **kwargs):
+    elapsed_ms = response.elapsed.total_seconds() * 1000
+    bucket = next(
+        (f"<={bound}ms" for bound in HTTP_LATENCY_BUCKETS_MS if elapsed_ms <= bound),
+        f">{HTTP_LATENCY_BUCKETS_MS[-1]}ms",
+    )
+    with run_report_lock:
+        stats = run_report['http'].setdefault(http_endpoint(response.url), {
+            'count': 0, 'total_ms': 0.0, 'min_ms': None, 'max_ms': 0.0, 'histogram': {},
+        })
+        stats['count'] += 1
+        stats['total_ms'] = round(stats['total_ms'] + elapsed_ms, 3)
+        stats['min_ms'] = round(elapsed_ms if stats['min_ms'] is None else min(stats['min_ms'], elapsed_ms), 3)
+        stats['max_ms'] = round(max(stats['max_ms'], elapsed_ms), 3)
+        stats['histogram'][bucket] = stats['histogram'].get(bucket, 0) + 1
+
+def report_filename(output_filename, suffix):
+    output_path = Path(output_filename)
+    return str(output_path.with_name(output_path.stem + suffix))
+
+def run_report_stage_totals():
+    stage_totals = {}
+    for record in run_report['stages']:
+        totals = stage_totals.setdefault(record['name'], {'calls': 0, 'seconds': 0.0})
+        totals['calls'] += 1
+        totals['seconds'] = round(totals['seconds'] + record['seconds'], 6)
+    return stage_totals
+
+def write_run_report(report_path, **details):
+    with run_report_lock:
+        if tracemalloc.is_tracing():
+            fold_memory_peak()
+        report = dict(
+            details,
+            total_seconds=round(time.time() - run_report['started'], 3),
+            peak_memory_bytes=run_report.get('peak_memory_bytes'),
+            stage_totals=run_report_stage_totals(),
+            stages=list(run_report['stages']),
+            http=run_report['http'],
+        )
+
+    with open(report_path, 'w') as file:
+        json.dump(report, file, indent=2, default=str)
+    print(f"Wrote the run report to {report_path}")
+
+
+def create_session():
+    session = requests.Session()
+    retries = urllib3.Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=('GET',),
+    )
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.hooks['response'].append(record_http_latency)
+    return session
+
+def configure_response_cache(download_path, ttl=RESPONSE_CACHE_TTL, refresh=False, record=None, replay=None):
+    if replay:
+        response_cache.update(path=Path(replay), ttl=None, max_entries=None, refresh=False, record=False, replay=True)
+    elif record:
+        response_cache.update(path=Path(record), ttl=None, max_entries=None, refresh=True, record=True, replay=False)
+    else:
+        response_cache.update(path=Path(download_path) / RESPONSE_CACHE_DIR if ttl else None, ttl=ttl,
+                              max_entries=RESPONSE_CACHE_MAX_ENTRIES, refresh=refresh, record=False, replay=False)
+    if response_cache['path'] is not None:
+        response_cache['path'].mkdir(parents=True, exist_ok=True)
+    return dict(response_cache)
+
+def response_cache_entry_path(url, params=None):
+    if response_cache['path'] is None:
+        return None
+    normalized = sorted(
+        (key, sorted(value) if isinstance(value, (list, tuple)) else value)
+        for key, value in (params or {}).items()
+    )
+    key = hashlib.sha256(json.dumps([url, normalized]).encode('utf-8')).hexdigest()
+    return response_cache['path'] / f'{key}.json'
+
+def evict_response_cache():
+    if response_cache['max_entries'] is None:
+        return
+    entries = []
+    for path in response_cache['path'].glob('*.json'):
+        # Another batch worker may have evicted the entry since the glob
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    entries.sort()
+    for _, path in entries[:max(len(entries) - response_cache['max_entries'], 0)]:
+        path.unlink(missing_ok=True)
+
+def read_response_cache_entry(entry_path):
+    if entry_path is None or response_cache['refresh']:
+        return None
+    try:
+        with open(entry_path, 'r') as file:
+            entry = json.load(file)
+        if not isinstance(entry, dict) or not RESPONSE_CACHE_FIELDS <= entry.keys():
+            return None
+        if response_cache['ttl'] is not None and time.time() - entry['fetched_at'] >= response_cache['ttl']:
+            return None
+        os.utime(entry_path)
+    except (OSError, ValueError):
+        # Missing, evicted or unreadable entries are treated as a miss and rewritten
+        return None
+    print(f"Using the cached response for {http_endpoint(entry['url'])}")
+    return entry
+
+def response_cache_temp_path(entry_path):
+    return entry_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+
+def write_response_cache_entry(entry_path, url, params, status_code, text):
+    temp_path = response_cache_temp_path(entry_path)
+    with open(temp_path, 'w') as file:
+        json.dump({'url': url, 'params': params, 'status_code': status_code,
+                   'text': text, 'fetched_at': time.time()}, file)
+    os.replace(temp_path, entry_path)
+    evict_response_cache()
+
+def cached_get(session, url, params=None):
+    entry_path = response_cache_entry_path(url, params)
+    entry = read_response_cache_entry(entry_path)
+    if entry is not None:
+        return entry['status_code'], entry['text']
+    if response_cache['replay']:
+        raise requests.RequestException(f"No recorded response for {url}")
+
+    response = session.get(url, params=params, timeout=HTTP_TIMEOUT)
+    if entry_path is not None and response.status_code == 200:
+        write_response_cache_entry(entry_path, url, params, response.status_code, response.text)
+    return response.status_code, response.text
+
+@contextlib.contextmanager
+def cached_stream(session, url, params=None):
+    entry_path = response_cache_entry_path(url, params)
+    entry = read_response_cache_entry(entry_path)
+    if entry is not None:
+        yield entry['status_code'], iter([entry['text'].encode('utf-8')])
+        return
+    if response_cache['replay']:
+        raise requests.RequestException(f"No recorded response for {url}")
+
+    response = session.get(url, params=params, timeout=HTTP_TIMEOUT, stream=True)
+    try:
+        if entry_path is None or response.status_code != 200:
+            yield response.status_code, response.iter_content(chunk_size=JSON_STREAM_CHUNK_SIZE)
+            return
+
+        # The body is escaped into the entry's "text" field chunk by chunk instead of being held in memory
+        temp_path = response_cache_temp_path(entry_path)
+        complete = False
+        with open(temp_path, 'w') as file:
+            file.write(json.dumps({'url': url, 'params': params, 'status_code': response.status_code,
+                                   'fetched_at': time.time()})[:-1] + ', "text": "')
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')()
+            def read_chunks():
+                nonlocal complete
+                for chunk in response.iter_content(chunk_size=JSON_STREAM_CHUNK_SIZE):
+                    file.write(json.dumps(decoder.decode(chunk))[1:-1])
+                    yield chunk
+                file.write(json.dumps(decoder.decode(b'', final=True))[1:-1] + '"}')
+                complete = True
+            chunks = read_chunks()
+            try:
+                yield response.status_code, chunks
+                if response_cache['record']:
+                    # Recordings keep whole responses so --replay can answer any lookup
+                    collections.deque(chunks, maxlen=0)
+            finally:
+                chunks.close()
+        # A caller that stopped early leaves a partial body, which is dropped rather than cached
+        if complete:
+            os.replace(temp_path, entry_path)
+            evict_response_cache()
+    finally:
+        response.close()
+        if entry_path is not None:
+            response_cache_temp_path(entry_path).unlink(missing_ok=True)
+
+def iter_prefix_items(value, keys):
+    if not keys:
+        yield value
+    elif keys[0] == 'item':
+        for item in value if isinstance(value, list) else []:
+            yield from iter_prefix_items(item, keys[1:])
+    elif isinstance(value, dict) and keys[0] in value:
+        yield from iter_prefix_items(value[keys[0]], keys[1:])
+
+def iter_json_items(chunks, prefix):
+    if ijson is None:
+        yield from iter_prefix_items(json.loads(b''.join(chunks)), prefix.split('.'))
+        return
+
+    items = ijson.sendable_list()
+    parser = ijson.items_coro(items, prefix)
+    try:
+        for chunk in chunks:
+            parser.send(chunk)
+            yield from items
+            del items[:]
+        parser.close()
+        yield from items
+    except ijson.JSONError as error:
+        raise ValueError(f"Invalid JSON response: {error}") from error
+
+def load_export_cache(download_path):
+    cache_path = Path(download_path) / EXPORT_CACHE_INDEX
+    if cache_path.exists():
+        with open(cache_path, 'r') as file:
+            return json.load(file)
+    return {'latest': None, 'exports': {}, 'partials': {}}
+
+def save_export_cache(download_path, cache):
+    cache_path = Path(download_path) / EXPORT_CACHE_INDEX
+    temp_path = cache_path.with_suffix('.tmp')
+    with open(temp_path, 'w') as file:
+        json.dump(cache, file, indent=2)
+    os.replace(temp_path, cache_path)
+
+def file_sha256(path, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest
+
+def is_cached_export_intact(csv_file_path, entry):
+    if not entry or not csv_file_path.exists():
+        return False
+    stat = csv_file_path.stat()
+    if stat.st_size != entry['size']:
+        return False
+    if stat.st_mtime_ns == entry.get('mtime_ns'):
+        return True
+    return file_sha256(csv_file_path).hexdigest() == entry['sha256']
+
+@timed('fetch_export_index')
+def fetch_export_index(url, session, validators=None):
+    validators = validators or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    response = session.get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+    if response.status_code == 304:
+        return None, validators
     response.raise_for_status()
-    soup = BeautifulSoup(response.text, 'html.parser')
+    return response.text, {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+def find_latest_csv_url(url, index_html):
+    soup = bs4.BeautifulSoup(index_html, 'html.parser')
     csv_links = [a['href'] for a in soup.find_all('a', href=True) if a['href'].endswith('.csv')]
 
     if not csv_links:
         raise ValueError("No CSV files found at the provided URL.")
-    
-    latest_csv_url = csv_links[-1]
-    full_csv_url = urljoin(url, latest_csv_url)
-    csv_response = requests.get(full_csv_url)
-    csv_response.raise_for_status()
-    
+
+    return urljoin(url, csv_links[-1])
+
+def download_latest_csv(url, download_path, session=None):
+    session = session or create_session()
+    index_html, _ = fetch_export_index(url, session)
+    return download_csv(find_latest_csv_url(url, index_html), download_path, session)
+
+@timed('download_export')
+def download_csv(full_csv_url, download_path, session):
     csv_file_name = os.path.basename(full_csv_url)
-    csv_file_path = os.path.join(download_path, csv_file_name)
-    
-    with open(csv_file_path, 'wb') as file:
-        file.write(csv_response.content)
+    csv_file_path = Path(download_path) / csv_file_name
+    part_file_path = csv_file_path.with_name(csv_file_name + '.part')
+
+    cache = load_export_cache(download_path)
+    entry = cache['exports'].get(full_csv_url)
+    headers = {}
+    if is_cached_export_intact(csv_file_path, entry):
+        if not entry.get('etag') and not entry.get('last_modified'):
+            print(f"The latest CSV file {csv_file_name} is already cached at {csv_file_path}")
+            return str(csv_file_path)
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    else:
+        entry = None
 
-    print(f"Downloaded the latest CSV file: {csv_file_name} to {csv_file_path}")
+    partial = cache['partials'].get(full_csv_url)
+    resume_from = part_file_path.stat().st_size if part_file_path.exists() else 0
+    if entry is None and partial and resume_from:
+        headers['Range'] = f"bytes={resume_from}-"
+        headers['If-Range'] = partial.get('etag') or partial.get('last_modified')
+    else:
+        resume_from = 0
+
+    with session.get(full_csv_url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as csv_response:
+        if csv_response.status_code == 304:
+            cache['latest'] = csv_file_name
+            save_export_cache(download_path, cache)
+            print(f"The latest CSV file {csv_file_name} is already cached at {csv_file_path}")
+            return str(csv_file_path)
+        if csv_response.status_code == 416:
+            part_file_path.unlink()
+            cache['partials'].pop(full_csv_url, None)
+            save_export_cache(download_path, cache)
+            return download_csv(full_csv_url, download_path, session)
+        csv_response.raise_for_status()
+
+        validators = {
+            'etag': csv_response.headers.get('ETag'),
+            'last_modified': csv_response.headers.get('Last-Modified'),
+        }
+        if csv_response.status_code == 206:
+            digest = file_sha256(part_file_path)
+            mode = 'ab'
+            print(f"Resuming {csv_file_name} from byte {resume_from}")
+        else:
+            digest = hashlib.sha256()
+            mode = 'wb'
+        if validators['etag'] or validators['last_modified']:
+            cache['partials'][full_csv_url] = validators
+            save_export_cache(download_path, cache)
+
+        with open(part_file_path, mode) as file:
+            for chunk in csv_response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                file.write(chunk)
+                digest.update(chunk)
+
+    os.replace(part_file_path, csv_file_path)
+    stat = csv_file_path.stat()
+    cache['exports'][full_csv_url] = dict(
+        validators,
+        file=csv_file_name,
+        sha256=digest.hexdigest(),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+    )
+    cache['partials'].pop(full_csv_url, None)
+    cache['latest'] = csv_file_name
+    save_export_cache(download_path, cache)
 
-def get_csv_file():
-    script_directory = os.path.dirname(os.path.abspath(__file__))
-    csv_files = glob.glob(os.path.join(script_directory, '*.csv'))
-    
-    if len(csv_files) != 1:
-        raise ValueError(f"Expected exactly one CSV file in the folder, but found {len(csv_files)}.")
+    print(f"Downloaded the latest CSV file: {csv_file_name} to {csv_file_path}")
+    return str(csv_file_path)
+
+def get_csv_file(download_path):
+    cache = load_export_cache(download_path)
+    if cache.get('latest'):
+        csv_file_path = Path(download_path) / cache['latest']
+        if csv_file_path.exists():
+            return str(csv_file_path)
+
+    csv_files = glob.glob(os.path.join(download_path, '*.csv'))
+    if not csv_files:
+        raise ValueError(f"No CSV files found in {download_path}.")
     
-    return os.path.basename(csv_files[0])
+    return max(csv_files, key=os.path.getmtime)
 
 def parse_custom_time(time_str):
     time_parts = time_str.split(':')
@@ -69,280 +642,859 @@ def convert_to_utc(event_date, event_time):
     
     return event_datetime_utc
 
-def convert_and_rename_excel(csv_path, event_name):
-    df = pd.read_csv(csv_path, low_memory=False)
-    current_name = os.path.basename(csv_path)
-    file_number = current_name.split('_')[4].split('.')[0]
-    new_name = str(Path.cwd() / download_path / f'IP PPV {event_name}_{file_number}.xlsx')
-
-    
-    with pd.ExcelWriter(new_name, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name=os.path.splitext(current_name)[0])
-    
-    print("File converted and renamed successfully.")
-    return new_name
+def column_letter_names(column_names):
+    return {
+        letter: column_names[openpyxl.utils.column_index_from_string(letter) - 1]
+        for letter in (BILLING_COLUMN, PRICE_COLUMN, CORP_COLUMN, DATE_COLUMN)
+    }
+
+def export_validation_columns(column_names, letter_names):
+    missing = [column for column in EXPORT_KEY_COLUMNS if column not in column_names]
+    if missing:
+        raise ValueError(f"The PPV export has no {', '.join(missing)} column.")
+    wanted = {*EXPORT_KEY_COLUMNS, *letter_names.values()}
+    return [column for column in column_names if column in wanted]
+
+def tune_export_dtypes(df, letter_names):
+    categories = (*EXPORT_KEY_COLUMNS, letter_names[BILLING_COLUMN], letter_names[CORP_COLUMN], letter_names[DATE_COLUMN])
+    for column in dict.fromkeys(categories):
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+def read_export_csv(csv_path, columns=None, categories=()):
+    if pa is not None:
+        # pyarrow keeps text as Arrow strings, so converting keys to categoricals afterwards is cheap
+        return pd.read_csv(csv_path, usecols=columns, engine='pyarrow')
+    return pd.read_csv(csv_path, usecols=columns, dtype=dict.fromkeys(categories, 'category'), low_memory=False)
+
+def columnar_cache_path(csv_path):
+    return Path(csv_path).parent / COLUMNAR_CACHE_DIR / f'{export_file_number(csv_path)}.parquet'
+
+def is_columnar_cache_current(csv_path, cache_path):
+    return cache_path.exists() and cache_path.stat().st_mtime >= Path(csv_path).stat().st_mtime
+
+def write_columnar_cache(df, cache_path):
+    cache_path.parent.mkdir(exist_ok=True)
+    temp_path = cache_path.with_suffix('.tmp')
+    try:
+        df.to_parquet(temp_path, index=False)
+    except (pa.ArrowException, ValueError) as error:
+        print(f"Could not cache the export as Parquet: {error}")
+        return
+    os.replace(temp_path, cache_path)
+
+@timed('read_export')
+def read_export(csv_path, validation_only=False):
+    cache_path = columnar_cache_path(csv_path)
+    if pq is not None and is_columnar_cache_current(csv_path, cache_path):
+        column_names = pq.read_schema(cache_path).names
+        letter_names = column_letter_names(column_names)
+        columns = export_validation_columns(column_names, letter_names)
+        df = pd.read_parquet(cache_path, columns=columns if validation_only else None, memory_map=True)
+        print(f"Read data from the cached PPV export {cache_path.name}")
+    else:
+        column_names = list(pd.read_csv(csv_path, nrows=0).columns)
+        letter_names = column_letter_names(column_names)
+        columns = export_validation_columns(column_names, letter_names)
+        # Text keys parse straight to categoricals, numeric keys are converted after parsing
+        categories = dict.fromkeys((BILLING_EVENT_ID_COLUMN, letter_names[BILLING_COLUMN], letter_names[DATE_COLUMN]))
+        df = read_export_csv(csv_path, columns if validation_only else None, categories)
+        if validation_only:
+            print("Read the validation columns from the PPV export")
+        else:
+            print("Read data from the PPV export")
+            tune_export_dtypes(df, letter_names)
+            if pq is not None:
+                write_columnar_cache(df, cache_path)
+
+    df.attrs['column_letters'] = letter_names
+    return tune_export_dtypes(df, letter_names)
+
+def export_file_number(csv_path):
+    return os.path.basename(csv_path).split('_')[4].split('.')[0]
+
+def build_output_filename(csv_path, event_name, download_path):
+    file_number = export_file_number(csv_path)
+    return str(Path(download_path) / f'IP PPV {event_name}_{file_number}.xlsx')
+
+def new_workbook(write_only=False):
+    wb = openpyxl.Workbook(write_only=write_only)
+    if not write_only:
+        wb.remove(wb.active)
+    register_styles(wb)
+    return wb
+
+@timed('write_export_sheet')
+def write_export_sheet(wb, df, csv_path):
+    sheet = wb.create_sheet(title=os.path.splitext(os.path.basename(csv_path))[0])
+    sheet.append(df.columns.tolist())
+    for row in df.itertuples(index=False, name=None):
+        sheet.append([None if value != value else value for value in row])
+    return sheet
 
 def insert_datetime(sheet, column, datetime_value, row):
     sheet[f"{column}{row}"] = datetime_value
 
-def color_code_cells(sheet, column, value_to_match, start_row):
-    good_font_color = '006100'
-    good_fill_color = 'C6EFCE'
-    bad_font_color = '9C0006'
-    bad_fill_color = 'FFC7CE'
-    
-    for row in range(start_row, sheet.max_row + 1):
-        cell = sheet[f"{column}{row}"]
-        if cell.value == value_to_match:
-            cell.font = Font(color=good_font_color)
-            cell.fill = PatternFill(start_color=good_fill_color, end_color=good_fill_color, fill_type="solid")
-        else:
-            cell.font = Font(color=bad_font_color)
-            cell.fill = PatternFill(start_color=bad_fill_color, end_color=bad_fill_color, fill_type="solid")
-
-def color_code_prices(sheet, column, price_to_match, start_row):
-    good_font_color = '006100'
-    good_fill_color = 'C6EFCE'
-    bad_font_color = '9C0006'
-    bad_fill_color = 'FFC7CE'
-    
-    for row in range(start_row, sheet.max_row + 1):
-        cell = sheet[f"{column}{row}"]
-        if cell.value == price_to_match:
-            cell.font = Font(color=good_font_color)
-            cell.fill = PatternFill(start_color=good_fill_color, end_color=good_fill_color, fill_type="solid")
-        else:
-            cell.font = Font(color=bad_font_color)
-            cell.fill = PatternFill(start_color=bad_fill_color, end_color=bad_fill_color, fill_type="solid")
-
-def color_code_dates(sheet, column, date_to_match, start_row):
-    good_font_color = '006100'
-    good_fill_color = 'C6EFCE'
-    bad_font_color = '9C0006'
-    bad_fill_color = 'FFC7CE'
-    
-    for row in range(start_row, sheet.max_row + 1):
-        cell = sheet[f"{column}{row}"]
-        if cell.value == date_to_match:
-            cell.font = Font(color=good_font_color)
-            cell.fill = PatternFill(start_color=good_fill_color, end_color=good_fill_color, fill_type="solid")
-        else:
-            cell.font = Font(color=bad_font_color)
-            cell.fill = PatternFill(start_color=bad_fill_color, end_color=bad_fill_color, fill_type="solid")
-
-def find_next_empty_row(sheet, column, start_row):
-    for row in range(start_row, sheet.max_row + 1):
-        if sheet[f"{column}{row}"].value is None:
-            return row
-    return sheet.max_row + 1
-
-def compare_and_color_code(sheet, master_values):
-    good_font_color = '006100'
-    good_fill_color = 'C6EFCE'
-    bad_font_color = '9C0006'
-    bad_fill_color = 'FFC7CE'
-    
-    for row in range(2, sheet.max_row + 1):
-        cell = sheet[f"J{row}"]
-        value = cell.value
-        
-        if value and value in master_values:
-            cell.font = Font(color=good_font_color)
-            cell.fill = PatternFill(start_color=good_fill_color, end_color=good_fill_color, fill_type="solid")
-        else:
-            cell.font = Font(color=bad_font_color)
-            cell.fill = PatternFill(start_color=bad_fill_color, end_color=bad_fill_color, fill_type="solid")
-
-def compare_and_color_code_sheets(sheet, start_row):
-    good_font_color = '006100'
-    good_fill_color = 'C6EFCE'
-    bad_font_color = '9C0006'
-    bad_fill_color = 'FFC7CE'
-    
-    max_row = sheet.max_row
-    
-    for row in range(start_row, max_row + 1):
-        cell_a = sheet.cell(row=row, column=1).value
-        cell_b = sheet.cell(row=row, column=2).value
-        
-        found_match = False
-        
-        for b_row in range(start_row, max_row + 1):
-            if cell_a == sheet.cell(row=b_row, column=2).value:
-                found_match = True
-                break
-        
-        if found_match:
-            font_color = good_font_color
-            fill_color = good_fill_color
-        else:
-            font_color = bad_font_color
-            fill_color = bad_fill_color
-        
-        font_a = Font(color=font_color)
-        fill_a = PatternFill(start_color=fill_color, end_color=fill_color, fill_type='solid')
-        sheet.cell(row=row, column=1).font = font_a
-        sheet.cell(row=row, column=1).fill = fill_a
-        
-        font_b = Font(color=font_color)
-        fill_b = PatternFill(start_color=fill_color, end_color=fill_color, fill_type='solid')
-        sheet.cell(row=row, column=2).font = font_b
-        sheet.cell(row=row, column=2).fill = fill_b
-
-def fetch_filtered_tag_names(guid, billing_id):
-    url = f"http://inspector.merlin.comcast.net:8080/offerObjects?guid={guid}"
-    response = requests.get(url)
-    data = response.json()
+def register_styles(wb):
+    for name, (font_color, fill_color) in STYLE_COLORS.items():
+        if name in wb.named_styles:
+            continue
+        style = openpyxl.styles.NamedStyle(name=name)
+        style.font = openpyxl.styles.Font(color=font_color)
+        style.fill = openpyxl.styles.PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
+        wb.add_named_style(style)
+
+def cell_styler(sheet):
+    # Resolve both named styles once per sheet; assigning cell.style by name looks the style up on every cell
+    cell_class = openpyxl.cell.Cell
+    style_arrays = {}
+    for is_good, style_name in ((True, GOOD_STYLE), (False, BAD_STYLE)):
+        template = cell_class(sheet, row=1, column=1)
+        template.style = style_name
+        style_arrays[is_good] = template._style
+    return lambda value, is_good: cell_class(sheet, row=1, column=1, value=value, style_array=style_arrays[is_good])
+
+def conditional_rule(formula, style_name):
+    font_color, fill_color = STYLE_COLORS[style_name]
+    return openpyxl_rule.FormulaRule(
+        formula=[formula],
+        stopIfTrue=True,
+        font=openpyxl.styles.Font(color=font_color),
+        fill=openpyxl.styles.PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid"),
+    )
+
+def add_check_rules(sheet, cell_range, good_formula, bad_formula):
+    sheet.conditional_formatting.add(cell_range, conditional_rule(good_formula, GOOD_STYLE))
+    sheet.conditional_formatting.add(cell_range, conditional_rule(bad_formula, BAD_STYLE))
+
+def add_tier_rules(sheet, row_count, reference_row, corp_count):
+    if not row_count:
+        return
+    last_row = row_count + 1
+    for column in (BILLING_COLUMN, PRICE_COLUMN, DATE_COLUMN):
+        add_check_rules(sheet, f'{column}2:{column}{last_row}',
+                        f'{column}2=${column}${reference_row}', f'{column}2<>${column}${reference_row}')
+
+    corp_range = f'${CORP_COLUMN}${reference_row}:${CORP_COLUMN}${reference_row + max(corp_count, 1) - 1}'
+    add_check_rules(sheet, f'{CORP_COLUMN}2:{CORP_COLUMN}{last_row}',
+                    f'AND({CORP_COLUMN}2<>"",COUNTIF({corp_range},{CORP_COLUMN}2)>0)',
+                    f'AND({CORP_COLUMN}2<>"",COUNTIF({corp_range},{CORP_COLUMN}2)=0)')
+
+def add_availability_rules(sheet, last_row):
+    for column, other in (('A', 'B'), ('B', 'A')):
+        other_range = f'${other}$1:${other}${last_row}'
+        add_check_rules(sheet, f'{column}1:{column}{last_row}',
+                        f'AND({column}1<>"",COUNTIF({other_range},{column}1)>0)',
+                        f'AND({column}1<>"",COUNTIF({other_range},{column}1)=0)')
+
+@timed('filter_tiers')
+def filter_tiers(df, tier_filters):
+    tier_filters = {tier: (billing_id, int(source_id)) for tier, (billing_id, source_id) in tier_filters.items() if billing_id}
+    candidates = df[
+        df[BILLING_EVENT_ID_COLUMN].isin([billing_id for billing_id, _ in tier_filters.values()])
+        & df[SOURCE_ID_COLUMN].isin([source_id for _, source_id in tier_filters.values()])
+    ]
+    candidates = candidates[~candidates[CORP_CODE_COLUMN].astype(str).str.startswith(EXCLUDED_CORP_PREFIXES)]
+
+    billing_ids = candidates[BILLING_EVENT_ID_COLUMN]
+    source_ids = candidates[SOURCE_ID_COLUMN]
+    return {
+        tier: candidates[(billing_ids == billing_id) & (source_ids == source_id)]
+        for tier, (billing_id, source_id) in tier_filters.items()
+    }
+
+def frame_column(frame, column):
+    column_name = frame.attrs.get('column_letters', {}).get(column)
+    if column_name is not None:
+        return frame[column_name]
+    return frame.iloc[:, openpyxl.utils.column_index_from_string(column) - 1]
+
+def evaluate_tier(frame, billing_id, price, date_to_match, corp_codes):
+    return pd.DataFrame({
+        CHECK_COLUMNS[BILLING_COLUMN]: frame_column(frame, BILLING_COLUMN) == billing_id,
+        CHECK_COLUMNS[PRICE_COLUMN]: frame_column(frame, PRICE_COLUMN) == price,
+        CHECK_COLUMNS[DATE_COLUMN]: frame_column(frame, DATE_COLUMN) == date_to_match,
+        CHECK_COLUMNS[CORP_COLUMN]: frame_column(frame, CORP_COLUMN).isin(corp_codes),
+    }, index=frame.index)
+
+def find_previous_export(csv_file):
+    csv_file = os.path.abspath(csv_file)
+    previous_files = [
+        path for path in glob.glob(os.path.join(os.path.dirname(csv_file), '*.csv'))
+        if os.path.abspath(path) != csv_file and os.path.getmtime(path) <= os.path.getmtime(csv_file)
+    ]
+    return max(previous_files, key=os.path.getmtime) if previous_files else None
+
+def export_compare_columns(frame):
+    return [frame_column(frame, PRICE_COLUMN).name, frame_column(frame, DATE_COLUMN).name]
+
+def keyed_export_rows(frame, key_columns, compare_columns):
+    keyed = frame[key_columns + compare_columns].copy()
+    keyed['occurrence'] = keyed.groupby(key_columns, dropna=False, sort=False).cumcount()
+    keyed['row'] = frame.index
+    return keyed
+
+def diff_tier_rows(previous_frame, frame):
+    key_columns = list(EXPORT_KEY_COLUMNS)
+    compare_columns = export_compare_columns(frame)
+    merged = keyed_export_rows(previous_frame, key_columns, compare_columns).merge(
+        keyed_export_rows(frame, key_columns, compare_columns),
+        on=key_columns + ['occurrence'], how='outer', suffixes=('_previous', ''), indicator=True,
+    )
+
+    both = merged['_merge'] == 'both'
+    changed = pd.Series(False, index=merged.index)
+    for column in compare_columns:
+        previous, current = merged[f'{column}_previous'], merged[column]
+        changed |= both & (previous != current) & ~(previous.isna() & current.isna())
+
+    # Changed rows share a merged index label, so previous and current rows of one key line up
+    previous_rows = merged.loc[(merged['_merge'] == 'left_only') | changed, 'row_previous'].astype(int)
+    current_rows = merged.loc[(merged['_merge'] == 'right_only') | changed, 'row'].astype(int)
+    counts = {
+        'added': int((merged['_merge'] == 'right_only').sum()),
+        'removed': int((merged['_merge'] == 'left_only').sum()),
+        'changed': int(changed.sum()),
+        'unchanged': int((both & ~changed).sum()),
+    }
+    return previous_rows, current_rows, counts
+
+def validation_columns(frame):
+    return [*EXPORT_KEY_COLUMNS, *export_compare_columns(frame)]
+
+def validation_records(frame, rows):
+    records = frame.loc[rows, validation_columns(frame)]
+    return records.astype(object).where(records.notna(), None).to_dict('records')
+
+@timed('build_delta_report')
+def build_delta_report(previous_df, tier_frames, tier_checks, tier_filters, tier_expectations, corp_codes):
+    # Only the event's tier rows are diffed. Current results come from this run's checks and only the
+    # previous side of added, removed and changed rows is evaluated.
+    previous_tiers = filter_tiers(previous_df, tier_filters)
+
+    report = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0, 'tiers': {}}
+    for tier, expected in tier_expectations.items():
+        frame = tier_frames[tier]
+        previous_rows, current_rows, counts = diff_tier_rows(previous_tiers[tier], frame)
+        expected_values = (expected[BILLING_COLUMN], expected[PRICE_COLUMN], expected[DATE_COLUMN], corp_codes)
+        previous_checks = evaluate_tier(previous_tiers[tier].loc[previous_rows], *expected_values)
+        previous_ok = pd.Series(previous_checks.all(axis=1).to_numpy(), index=previous_rows.index)
+        current_ok = pd.Series(tier_checks[tier].loc[current_rows].all(axis=1).to_numpy(), index=current_rows.index)
+
+        changed = current_ok.index.intersection(previous_ok.index)
+        added = current_ok.index.difference(previous_ok.index)
+        removed = previous_ok.index.difference(current_ok.index)
+        for key, value in counts.items():
+            report[key] += value
+        report['tiers'][tier] = dict(
+            counts,
+            now_failing=validation_records(frame, current_rows[changed[previous_ok[changed] & ~current_ok[changed]]]),
+            now_passing=validation_records(frame, current_rows[changed[~previous_ok[changed] & current_ok[changed]]]),
+            added_failing=validation_records(frame, current_rows[added[~current_ok[added]]]),
+        )
+    return report
+
+def write_delta_report(csv_file, tier_frames, tier_checks, tier_filters, tier_expectations, corp_codes, output_filename):
+    previous_csv = find_previous_export(csv_file)
+    if previous_csv is None:
+        print("No previous PPV export to diff against")
+        return None
+
+    previous_df = read_export(previous_csv, validation_only=True)
+    try:
+        report = build_delta_report(previous_df, tier_frames, tier_checks, tier_filters, tier_expectations, corp_codes)
+    except (KeyError, ValueError) as error:
+        print(f"Could not diff against {os.path.basename(previous_csv)}: {error}")
+        return None
+    report = dict(previous_export=os.path.basename(previous_csv), export=os.path.basename(csv_file), **report)
+
+    delta_filename = report_filename(output_filename, '_delta.json')
+    with open(delta_filename, 'w') as file:
+        json.dump(report, file, indent=2, default=str)
+
+    print(f"Delta against {report['previous_export']}: {report['added']} added, {report['removed']} removed, "
+          f"{report['changed']} changed rows for this event")
+    for tier, delta in report['tiers'].items():
+        print(f"{tier} delta: {len(delta['now_failing'])} now failing, {len(delta['now_passing'])} now passing, "
+              f"{delta['added']} added ({len(delta['added_failing'])} failing), {delta['removed']} removed")
+    print(f"Wrote the delta report to {delta_filename}")
+    return delta_filename
+
+def reconcile_availabilities(expected_tags, merlin_tags):
+    expected = set(expected_tags)
+    merlin = set(merlin_tags)
+    return {
+        'matched': [tag for tag in dict.fromkeys(expected_tags) if tag in merlin],
+        'missing_in_merlin': [tag for tag in dict.fromkeys(expected_tags) if tag not in merlin],
+        'unexpected_in_merlin': [tag for tag in dict.fromkeys(merlin_tags) if tag not in expected],
+    }
+
+@timed('fetch_filtered_tag_names')
+def fetch_filtered_tag_names(guid, billing_id, session):
+    url = f"{MERLIN_INSPECTOR_URL}/offerObjects?guid={guid}"
     filtered_tag_names = []
+    try:
+        with cached_stream(session, url) as (status_code, chunks):
+            for offer in iter_json_items(chunks, 'offers.item'):
+                if offer.get('billingId') != billing_id:
+                    continue
+                for avail in offer.get('availabilities', []):
+                    tag_name = avail.get('availabilityTagName', '')
+                    if (tag_name.startswith(CORP_TAG_PREFIX)
+                            and not tag_name[len(CORP_TAG_PREFIX):].startswith(EXCLUDED_CORP_PREFIXES)):
+                        filtered_tag_names.append(tag_name)
+    except (requests.RequestException, ValueError) as error:
+        print(f"Failed to retrieve offer objects for {guid}: {error}")
+        return []
 
-    for offer in data.get('offers', []):
-        if offer.get('billingId') == billing_id:
-            for avail in offer.get('availabilities', []):
-                tag_name = avail.get('availabilityTagName', '')
-                if tag_name.startswith("Corp:") and not tag_name.startswith("Corp:8069") and not tag_name.startswith("Corp:8045"):
-                    filtered_tag_names.append(tag_name)
-    
     return filtered_tag_names
 
-def update_excel_with_tag_names(file_path, hd_data, sd_data, es_data):
-    wb = load_workbook(file_path)
-    if hd_data:
-        hd_sheet = wb['HD Availabilities']
-        for row_idx, tag_name in enumerate(hd_data, start=1):
-            hd_sheet.cell(row=row_idx, column=2, value=tag_name)
-        compare_and_color_code_sheets(hd_sheet, 1)
-
-    if sd_data:
-        sd_sheet = wb['SD Availabilities']
-        for row_idx, tag_name in enumerate(sd_data, start=1):
-            sd_sheet.cell(row=row_idx, column=2, value=tag_name)
-        compare_and_color_code_sheets(sd_sheet, 1)
-        
-    if es_data:
-        es_sheet = wb['ES Availabilities']
-        for row_idx, tag_name in enumerate(es_data, start=1):
-            es_sheet.cell(row=row_idx, column=2, value=tag_name)
-        compare_and_color_code_sheets(es_sheet, 1)
-
-    wb.save(file_path)
-
-def fetch_html_content(url):
-    response = requests.get(url)
-    if response.status_code == 200:
-        return response.text
+def print_reconciliations(reconciliations):
+    for tier, reconciliation in reconciliations.items():
+        print(f"{tier} availabilities: {len(reconciliation['matched'])} matched, "
+              f"{len(reconciliation['missing_in_merlin'])} missing in Merlin, "
+              f"{len(reconciliation['unexpected_in_merlin'])} unexpected in Merlin")
+        for tag_name in reconciliation['missing_in_merlin']:
+            print(f"  Missing in Merlin: {tag_name}")
+        for tag_name in reconciliation['unexpected_in_merlin']:
+            print(f"  Unexpected in Merlin: {tag_name}")
+
+@timed('fetch_load_grid')
+def fetch_html_content(url, session):
+    try:
+        status_code, text = cached_get(session, url)
+    except requests.RequestException as error:
+        print(f"Failed to retrieve HTML content: {error}")
+        return None
+    if status_code == 200:
+        return text
     else:
-        print(f"Failed to retrieve HTML content: {response.status_code}")
+        print(f"Failed to retrieve HTML content: {status_code}")
         return None
 
-def parse_listing_ids(html_content, event_name):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    hd_ids, sd_ids, es_ids = [], [], []
-    hd_pids, sd_pids, es_pids = [], [], []
-    hd_sids, sd_sids, es_sids = [], [], []
-    hd_cids, sd_cids, es_cids = [], [], []
-
-    hd_items = soup.find_all(lambda tag: tag.name == 'a' and 
-                             tag.get('data-grid-under') == 'grid-under-504' and
-                             any(keyword.lower() in tag.get_text(strip=True).lower() for keyword in event_name.split()))
-
-    sd_items = soup.find_all(lambda tag: tag.name == 'a' and 
-                             tag.get('data-grid-under') == 'grid-under-501' and
-                             any(keyword.lower() in tag.get_text(strip=True).lower() for keyword in event_name.split()))
-    
-    es_items = soup.find_all(lambda tag: tag.name == 'a' and 
-                             tag.get('data-grid-under') == 'grid-under-502' and
-                             any(keyword.lower() in tag.get_text(strip=True).lower() for keyword in event_name.split()))
-
-    for item in hd_items:
-        listing_id = item.get('data-listingid')
-        if listing_id:
-            hd_ids.append(listing_id)
-        program_id = item.get('data-merlinid')
-        if program_id:
-            hd_pids.append(program_id)
-        station_id = item.get('data-stationid')
-        if station_id:
-            hd_sids.append(station_id)
-        channel_id = item.get('data-channelid')
-        if channel_id:
-            hd_cids.append(channel_id)
+def iter_grid_anchors(html_content):
+    if lxml_html is not None:
+        document = lxml_html.fromstring(html_content)
+        for anchor in document.iter('a'):
+            grid_under = anchor.get('data-grid-under')
+            if grid_under:
+                yield grid_under, anchor.attrib, ''.join(text.strip() for text in anchor.itertext())
+    else:
+        soup = bs4.BeautifulSoup(html_content, 'html.parser')
+        for anchor in soup.find_all('a', attrs={'data-grid-under': True}):
+            yield anchor['data-grid-under'], anchor.attrs, anchor.get_text(strip=True)
 
-    for item in sd_items:
-        listing_id = item.get('data-listingid')
-        if listing_id:
-            sd_ids.append(listing_id)
-        program_id = item.get('data-merlinid')
-        if program_id:
-            sd_pids.append(program_id)
-        station_id = item.get('data-stationid')
-        if station_id:
-            sd_sids.append(station_id)
-        channel_id = item.get('data-channelid')
-        if channel_id:
-            sd_cids.append(channel_id)
-            
-    for item in es_items:
-        listing_id = item.get('data-listingid')
+@timed('parse_listing_ids')
+def parse_listing_ids(html_content, event_name):
+    keywords = [keyword.lower() for keyword in event_name.split()]
+    grid_listings = {tier: TierListings([], [], [], []) for tier in GRID_TIERS.values()}
+
+    for grid_under, attributes, text in iter_grid_anchors(html_content):
+        tier = GRID_TIERS.get(grid_under)
+        if tier is None:
+            continue
+        text = text.lower()
+        if not any(keyword in text for keyword in keywords):
+            continue
+
+        listings = grid_listings[tier]
+        listing_id = attributes.get('data-listingid')
         if listing_id:
-            es_ids.append(listing_id)
-        program_id = item.get('data-merlinid')
+            listings.listing_ids.append(listing_id)
+        program_id = attributes.get('data-merlinid')
         if program_id:
-            es_pids.append(program_id)
-        station_id = item.get('data-stationid')
+            listings.program_ids.append(program_id)
+        station_id = attributes.get('data-stationid')
         if station_id:
-            es_sids.append(station_id)
-        channel_id = item.get('data-channelid')
+            listings.station_ids.append(station_id)
+        channel_id = attributes.get('data-channelid')
         if channel_id:
-            es_cids.append(channel_id)
-
-    return hd_ids, sd_ids, hd_pids, sd_pids, hd_cids, sd_cids, hd_sids, sd_sids, es_ids, es_pids, es_sids, es_cids
-
-def get_media_guid(url, params, settlement_reference):
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        entries = data.get('entries', [])
-
-        for entry in entries:
-            offer_media_associations = entry.get('offerMediaAssociations', [])
-            for association in offer_media_associations:
-                if association.get('settlementReference') == settlement_reference:
-                    media_guid = association.get('mediaId', {}).get('mediaGuid')
-                    if media_guid:
-                        return media_guid
+            listings.channel_ids.append(channel_id)
+
+    return grid_listings
+
+@timed('get_media_guids')
+def get_media_guids(session, listing_ids, settlement_references):
+    pending = collections.defaultdict(list)
+    for tier, settlement_reference in settlement_references.items():
+        pending[settlement_reference].append(tier)
+    media_guids = {}
+
+    for page_start in range(0, len(listing_ids), OFFER_PAGE_SIZE):
+        params = dict(OFFER_PARAMS)
+        params["byOfferEntityAssociations.entityId"] = listing_ids[page_start:page_start + OFFER_PAGE_SIZE]
+        try:
+            with cached_stream(session, OFFER_URL, params) as (status_code, chunks):
+                if status_code != 200:
+                    print(f"Failed to retrieve data: {status_code}")
+                    continue
+                for association in iter_json_items(chunks, 'entries.item.offerMediaAssociations.item'):
+                    settlement_reference = association.get('settlementReference')
+                    media_guid = (association.get('mediaId') or {}).get('mediaGuid')
+                    if settlement_reference in pending and media_guid:
+                        for tier in pending.pop(settlement_reference):
+                            media_guids[tier] = media_guid
+                        if not pending:
+                            return media_guids
+        except (requests.RequestException, ValueError) as error:
+            print(f"Failed to retrieve data: {error}")
+
+    return media_guids
+
+def fetch_tier_offers(session, tier_lookups):
+    if not tier_lookups:
+        return {}
+    listing_ids = list(dict.fromkeys(
+        listing_id for listing_ids, _ in tier_lookups.values() for listing_id in listing_ids
+    ))
+    billing_ids = {tier: billing_id for tier, (_, billing_id) in tier_lookups.items()}
+    media_guids = get_media_guids(session, listing_ids, billing_ids)
+
+    with ThreadPoolExecutor(max_workers=len(tier_lookups)) as executor:
+        futures = {
+            tier: executor.submit(fetch_filtered_tag_names, media_guids[tier], billing_ids[tier], session)
+            for tier in tier_lookups if tier in media_guids
+        }
+        return {
+            tier: (media_guids.get(tier), futures[tier].result() if tier in futures else [])
+            for tier in tier_lookups
+        }
+
+def fetch_grid_and_offers(session, grid_url, event_name, tier_billing_ids):
+    html_content = fetch_html_content(grid_url, session)
+    if not html_content:
+        return None, {}
+
+    grid_listings = parse_listing_ids(html_content, event_name)
+    tier_lookups = {
+        tier: (grid_listings[tier].listing_ids, billing_id)
+        for tier, billing_id in tier_billing_ids.items()
+        if billing_id and grid_listings[tier].listing_ids
+    }
+    return grid_listings, fetch_tier_offers(session, tier_lookups)
+
+def load_grid_url(event):
+    event_datetime_iso = convert_to_utc(event['broadcast_date'], event['broadcast_time']).strftime('%Y-%m-%dT%H:%MZ')
+    return f"{MERLIN_INSPECTOR_URL}/loadGrid?accountId=7876220869746444319&startDate={event_datetime_iso}&clientProfile=XRE:X2&supportedCatalogs=TitleVI,CTV&freeToMe=off"
+
+def start_network_fetch(executor, session, event):
+    billing_ids = event['billing_ids']
+    return executor.submit(fetch_grid_and_offers, session, load_grid_url(event), event['event_name'], {
+        tier: billing_ids[tier] for tier in TIERS if billing_ids[tier]
+    })
+
+def plan_tier_layout(header, row_count, corp_count):
+    # Every data row spans the header, so the high-water mark of each column is the last data row
+    # and the reference block can be placed before anything is written.
+    width = max(len(header), *(openpyxl.utils.column_index_from_string(column) for column in CHECK_COLUMNS))
+    last_data_row = row_count + 1
+    reference_row = last_data_row + 2
+    return TierLayout(width, last_data_row, reference_row, reference_row + max(corp_count, 1) - 1)
+
+def reference_block_rows(sheet, layout, expected, corp_values):
+    styled_cell = cell_styler(sheet)
+    corp_position = openpyxl.utils.column_index_from_string(CORP_COLUMN) - 1
+    rows = [[None] * layout.width for _ in range(layout.last_reference_row - layout.reference_row + 1)]
+    for column, expected_value in expected.items():
+        rows[0][openpyxl.utils.column_index_from_string(column) - 1] = styled_cell(expected_value, True)
+    for row, value in zip(rows, corp_values):
+        row[corp_position] = styled_cell(value, True)
+    return rows
+
+@timed('build_tier_sheets')
+def build_tier_sheets(wb, df, tier_frames, tier_checks, tier_expectations, corp_values, conditional_formatting=False):
+    header = df.columns.tolist()
+    check_positions = [
+        (openpyxl.utils.column_index_from_string(column) - 1, check_index)
+        for check_index, column in enumerate(CHECK_COLUMNS.keys())
+    ]
+    corp_position = openpyxl.utils.column_index_from_string(CORP_COLUMN) - 1
+
+    for tier, expected in tier_expectations.items():
+        layout = plan_tier_layout(header, len(tier_frames[tier]), len(corp_values))
+        sheet = wb.create_sheet(title=f'{tier} - {expected[BILLING_COLUMN]}')
+        print(f"Created {tier} sheet in the workbook")
+        sheet.append(header)
+        styled_cell = cell_styler(sheet)
+
+        if conditional_formatting:
+            for row in tier_frames[tier].itertuples(index=False, name=None):
+                sheet.append(row)
+            add_tier_rules(sheet, len(tier_frames[tier]), layout.reference_row, len(corp_values))
+        else:
+            checks = tier_checks[tier][list(CHECK_COLUMNS.values())]
+            for row, row_checks in zip(tier_frames[tier].itertuples(index=False, name=None),
+                                       checks.itertuples(index=False, name=None)):
+                values = list(row)
+                for position, check_index in check_positions:
+                    if position == corp_position and values[position] is None:
+                        continue
+                    values[position] = styled_cell(values[position], row_checks[check_index])
+                sheet.append(values)
+
+        sheet.append([])
+        for row in reference_block_rows(sheet, layout, expected, corp_values):
+            sheet.append(row)
+
+def merge_availability_rows(availability_rows, tag_names):
+    rows = [list(row) for row in availability_rows]
+    for row_idx, tag_name in enumerate(tag_names):
+        if row_idx >= len(rows):
+            rows.append([])
+        row = rows[row_idx]
+        row.extend([None] * (2 - len(row)))
+        row[1] = tag_name
+    return rows
+
+@timed('build_availability_sheets')
+def build_availability_sheets(wb, tiers, availability_rows, tier_tag_names, conditional_formatting=False):
+    reconciliations = {}
+    for tier in tiers:
+        sheet = wb.create_sheet(title=f'{tier} Availabilities')
+        tag_names = tier_tag_names.get(tier)
+        if not tag_names:
+            for row in availability_rows:
+                sheet.append(row)
+            continue
+
+        rows = merge_availability_rows(availability_rows, tag_names)
+        reconciliation = reconcile_availabilities(
+            [row[0] for row in rows if row and row[0] is not None],
+            [row[1] for row in rows if len(row) > 1 and row[1] is not None],
+        )
+        reconciliations[tier] = reconciliation
+        if conditional_formatting:
+            for row in rows:
+                sheet.append(row)
+            add_availability_rules(sheet, len(rows))
+            continue
+
+        matched = set(reconciliation['matched'])
+        styled_cell = cell_styler(sheet)
+        for row in rows:
+            for index, value in enumerate(row[:2]):
+                if value is not None:
+                    row[index] = styled_cell(value, value in matched)
+            sheet.append(row)
+    return reconciliations
+
+def reconcile_tier_availabilities(availability_rows, tier_tag_names):
+    expected_tags = [row[0] for row in availability_rows if row and row[0] is not None]
+    return {
+        tier: reconcile_availabilities(expected_tags, tag_names)
+        for tier, tag_names in tier_tag_names.items()
+        if tag_names
+    }
+
+def ticket_details(event, grid_listings, tier_offers):
+    details = {}
+    for tier in (tier for tier in TIERS if event['billing_ids'][tier]):
+        listings = grid_listings[tier] if grid_listings else TierListings([], [], [], [])
+        details[tier] = dict(
+            billing_id=event['billing_ids'][tier],
+            price=event['prices'][tier],
+            media_guid=tier_offers.get(tier, (None, []))[0],
+            **listings._asdict(),
+        )
+    return details
+
+def mismatch_records(frame, checks):
+    failing = checks[~checks.all(axis=1)]
+    records = []
+    for row, record in zip(failing.index, validation_records(frame, failing.index)):
+        failed = [name.removesuffix('_ok') for name, ok in failing.loc[row].items() if not ok]
+        records.append(dict(row=int(row) + 2, failed=failed, **record))
+    return records
+
+@timed('write_mismatch_report')
+def write_mismatch_report(report_format, output_filename, event, csv_file, date_to_match, tier_frames, tier_checks,
+                          reconciliations, grid_listings, tier_offers):
+    tier_mismatches = {tier: mismatch_records(tier_frames[tier], checks) for tier, checks in tier_checks.items()}
+    report_path = report_filename(output_filename, f'_mismatches.{report_format}')
+
+    if report_format == 'csv':
+        columns = validation_columns(next(iter(tier_frames.values()))) if tier_frames else []
+        with open(report_path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['tier', 'row', 'failed', *columns, 'tag'])
+            writer.writeheader()
+            for tier, records in tier_mismatches.items():
+                for record in records:
+                    writer.writerow(dict(record, tier=tier, failed=';'.join(record['failed'])))
+            for tier, reconciliation in reconciliations.items():
+                for failed in ('missing_in_merlin', 'unexpected_in_merlin'):
+                    for tag_name in reconciliation[failed]:
+                        writer.writerow({'tier': tier, 'failed': failed, 'tag': tag_name})
     else:
-        print(f"Failed to retrieve data: {response.status_code}")
-    return None
-
-def main():
-    
-    start_time = time.time()  # Start the timer
-
-    url = "https://vcwarchive.g.comcast.net/vcwh_exports/ppv/"
-
-    user_home = Path.home()
-    download_path = user_home / "PPV_Validation_Outputs"
-    download_path.mkdir(exist_ok=True)
+        details = ticket_details(event, grid_listings, tier_offers)
+        report = {
+            'event_name': event['event_name'],
+            'broadcast_date': event['broadcast_date'],
+            'broadcast_time': event['broadcast_time'],
+            'date_to_match': date_to_match,
+            'export': os.path.basename(csv_file),
+            'tiers': {
+                tier: dict(
+                    details.get(tier, {}),
+                    rows=len(tier_checks[tier]),
+                    mismatches=tier_mismatches[tier],
+                    missing_in_merlin=reconciliations.get(tier, {}).get('missing_in_merlin', []),
+                    unexpected_in_merlin=reconciliations.get(tier, {}).get('unexpected_in_merlin', []),
+                )
+                for tier in tier_checks
+            },
+        }
+        with open(report_path, 'w') as file:
+            json.dump(report, file, indent=2, default=str)
+
+    mismatch_count = sum(len(records) for records in tier_mismatches.values())
+    print(f"Wrote {mismatch_count} mismatched rows to {report_path}")
+    return report_path
+
+def open_history(download_path):
+    connection = sqlite3.connect(Path(download_path) / HISTORY_DB_FILENAME, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(HISTORY_SCHEMA)
+    return connection
+
+def insert_history_record(connection, table, record):
+    columns = ', '.join(record)
+    placeholders = ', '.join(f':{column}' for column in record)
+    return connection.execute(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', record).lastrowid
+
+def history_values(series):
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def history_ids(values):
+    return json.dumps(values) if values is not None else None
+
+def history_row_records(run_id, tier, frame, checks, export_rows=True):
+    rows = [int(row) + 2 for row in frame.index] if export_rows else [None] * len(frame)
+    source_ids = history_values(frame[SOURCE_ID_COLUMN]) if SOURCE_ID_COLUMN in frame.columns else [None] * len(frame)
+    columns = [history_values(frame_column(frame, column))
+               for column in (CORP_COLUMN, BILLING_COLUMN, PRICE_COLUMN, DATE_COLUMN)]
+    check_values = [checks[f'{check}_ok'].astype(int).tolist() for check in HISTORY_CHECKS]
+    return [(run_id, tier, *values) for values in zip(rows, source_ids, *columns, *check_values)]
+
+@timed('record_history')
+def record_history(download_path, run, tier_results, export_rows=True):
+    connection = open_history(download_path)
+    try:
+        with connection:
+            run_id = insert_history_record(connection, 'runs', run)
+            for tier, (details, frame, checks, reconciliation) in tier_results.items():
+                insert_history_record(connection, 'tier_results', dict(
+                    run_id=run_id,
+                    tier=tier,
+                    billing_id=details.get('billing_id'),
+                    price=details.get('price'),
+                    media_guid=details.get('media_guid'),
+                    listing_ids=history_ids(details.get('listing_ids')),
+                    program_ids=history_ids(details.get('program_ids')),
+                    station_ids=history_ids(details.get('station_ids')),
+                    channel_ids=history_ids(details.get('channel_ids')),
+                    rows=len(checks),
+                    **{f'{check}_failures': int((~checks[f'{check}_ok']).sum()) for check in HISTORY_CHECKS},
+                    matched_availabilities=len(reconciliation.get('matched', [])),
+                    missing_in_merlin=len(reconciliation.get('missing_in_merlin', [])),
+                    unexpected_in_merlin=len(reconciliation.get('unexpected_in_merlin', [])),
+                ))
+                connection.executemany(
+                    'INSERT INTO row_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    history_row_records(run_id, tier, frame, checks, export_rows),
+                )
+                connection.executemany(
+                    'INSERT INTO availability_diffs VALUES (?, ?, ?, ?)',
+                    [(run_id, tier, tag_name, status)
+                     for status in ('missing_in_merlin', 'unexpected_in_merlin')
+                     for tag_name in reconciliation.get(status, [])],
+                )
+    finally:
+        connection.close()
+    print(f"Recorded the results in {HISTORY_DB_FILENAME} as run {run_id}")
+    return run_id
+
+def parse_workbook_name(workbook_path):
+    stem = Path(workbook_path).stem
+    if not stem.startswith('IP PPV '):
+        return None, None
+    event_name, separator, file_number = stem[len('IP PPV '):].rpartition('_')
+    return (event_name, file_number) if separator else (stem, None)
+
+def padded_rows(sheet, width):
+    for row in sheet.iter_rows(values_only=True):
+        row = list(row[:width])
+        yield row + [None] * (width - len(row))
+
+def read_tier_sheet(sheet):
+    header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+    width = max(len(header), *(openpyxl.utils.column_index_from_string(column) for column in CHECK_COLUMNS))
+    rows = list(padded_rows(sheet, width))[1:]
+    data_count = next((index for index, row in enumerate(rows) if all(value is None for value in row)), len(rows))
+    reference_index = next(
+        (index for index in range(data_count, len(rows)) if any(value is not None for value in rows[index])), None)
+    if reference_index is None:
+        return None
 
-    download_latest_csv(url, download_path)
-
-    csv_file = get_csv_file()
-    event_name = input("Enter the event name: ")
-    output_filename = convert_and_rename_excel(csv_file, event_name)
-
-    HD_value_to_match = input("Enter the HD value to match (leave blank to skip): ")
-    SD_value_to_match = input("Enter the SD value to match (leave blank to skip): ")
-    ES_value_to_match = input("Enter the ES value to match (leave blank to skip): ")
-    HD_Price = input("Enter the HD Price (leave blank to skip): ")
-    SD_Price = input("Enter the SD Price (leave blank to skip): ")
-    ES_Price = input("Enter the ES Price (leave blank to skip): ")
-    Event_broadcast_date = input("Enter the event broadcast date (e.g., Saturday June 15): ")
-    Event_broadcast_time = input("Enter the event countdown time (e.g., 7:00p for PM or 7:00a for AM): ")
-    HD_SID = '13503'
-    SD_SID = '12162'
-    ES_SID = '15006'
-
-    event_datetime_combined = convert_to_utc(Event_broadcast_date, Event_broadcast_time)
+    columns = [name if name is not None else f'column_{index}' for index, name in
+               enumerate(list(header) + [None] * (width - len(header)))]
+    frame = pd.DataFrame(rows[:data_count], columns=columns)
+    position = {column: openpyxl.utils.column_index_from_string(column) - 1 for column in CHECK_COLUMNS}
+    reference = rows[reference_index]
+    corp_values = [row[position[CORP_COLUMN]] for row in rows[reference_index:] if row[position[CORP_COLUMN]] is not None]
+    return frame, reference[position[BILLING_COLUMN]], reference[position[PRICE_COLUMN]], reference[position[DATE_COLUMN]], corp_values
+
+def read_availability_sheet(sheet):
+    rows = [row for row in sheet.iter_rows(max_col=2, values_only=True) if row]
+    merlin_tags = [row[1] for row in rows if len(row) > 1 and row[1] is not None]
+    if not merlin_tags:
+        return {}
+    return reconcile_availabilities([row[0] for row in rows if row[0] is not None], merlin_tags)
+
+@timed('backfill_workbook')
+def backfill_workbook(download_path, workbook_path):
+    event_name, file_number = parse_workbook_name(workbook_path)
+    wb = openpyxl.load_workbook(workbook_path, read_only=True)
+    try:
+        tier_results = {}
+        date_to_match = None
+        export = next((f'{name}.csv' for name in wb.sheetnames if name.startswith('ppv_export')), None)
+        for name in wb.sheetnames:
+            tier, separator, _ = name.partition(' - ')
+            if not separator:
+                continue
+            tier_sheet = read_tier_sheet(wb[name])
+            if tier_sheet is None:
+                continue
+            frame, billing_id, price, tier_date, corp_values = tier_sheet
+            date_to_match = date_to_match or tier_date
+            checks = evaluate_tier(frame, billing_id, float(price), tier_date, frozenset(corp_values))
+            availabilities = f'{tier} Availabilities'
+            reconciliation = read_availability_sheet(wb[availabilities]) if availabilities in wb.sheetnames else {}
+            details = dict(billing_id=billing_id, price=f'{price:g}' if isinstance(price, float) else str(price))
+            tier_results[tier] = (details, frame, checks, reconciliation)
+    finally:
+        wb.close()
+
+    if not tier_results:
+        print(f"No tier sheets found in {os.path.basename(workbook_path)}")
+        return None
+    run = dict(
+        event_name=event_name,
+        export=export,
+        file_number=file_number,
+        date_to_match=date_to_match,
+        validated_at=datetime.fromtimestamp(os.path.getmtime(workbook_path)).isoformat(timespec='seconds'),
+        source='backfill',
+        workbook=os.path.abspath(workbook_path),
+    )
+    return record_history(download_path, run, tier_results, export_rows=False)
+
+def failing_streaks(timeline, check):
+    streaks = {}
+    for row in timeline:
+        key = (row['event_name'], row['tier'])
+        if row[f'{check}_failures']:
+            streaks.setdefault(key, row)
+        else:
+            streaks.pop(key, None)
+    return streaks
+
+def print_history_table(rows):
+    if not rows:
+        print("No matching runs in the history")
+        return
+    columns = list(rows[0])
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    print('  '.join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(widths[column]) for column in columns))
+
+def print_ticket_details(event, grid_listings, tier_offers):
+    billing_ids = event['billing_ids']
+    prices = event['prices']
+    tiers = [tier for tier in TIERS if billing_ids[tier]]
+
+    print(f"---Details for ticket creation---\n")
+    print(f"PPV Validations - {event['event_name']}")
+    print(f"{event['broadcast_date']}\n")
+    print(f"Event time: {event['broadcast_time']}\n")
+    for tier in tiers:
+        print(f"{tier} Price: {prices[tier]}")
+    print("\n")
+    for tier in tiers:
+        listings = grid_listings[tier]
+        media_guid, _ = tier_offers.get(tier, (None, []))
+        print(f"{tier}: {billing_ids[tier]}")
+        print(f"listing_id: {listings.listing_ids}")
+        print(f"Program {tier} ID: {listings.program_ids}")
+        print(f"Channel {tier} ID: {listings.channel_ids}")
+        print(f"Station {tier} ID: {listings.station_ids}")
+        print(f"{tier}_Media_Guid: {media_guid}\n")
+
+def master_corp_index_path(master_corp_path):
+    return Path(master_corp_path).with_suffix(MASTER_CORP_INDEX_SUFFIX)
+
+def read_master_corp_workbook(master_corp_path):
+    master_corp_wb = openpyxl.load_workbook(master_corp_path, read_only=True)
+    try:
+        corp_values = [
+            value for (value,) in master_corp_wb["Corp"].iter_rows(min_col=1, max_col=1, values_only=True)
+            if value is not None
+        ]
+        availability_rows = [list(row) for row in master_corp_wb["Corp Availability"].iter_rows(values_only=True)]
+    finally:
+        master_corp_wb.close()
+    return corp_values, availability_rows
+
+def save_master_corp_index(index_path, index):
+    temp_path = index_path.with_suffix('.tmp')
+    with open(temp_path, 'w') as file:
+        json.dump(index, file)
+    os.replace(temp_path, index_path)
+
+@timed('load_master_corp')
+def load_master_corp(master_corp_path):
+    master_corp_path = Path(master_corp_path)
+    index_path = master_corp_index_path(master_corp_path)
+    index = None
+    if index_path.exists():
+        with open(index_path, 'r') as file:
+            index = json.load(file)
+
+    if is_cached_export_intact(master_corp_path, index):
+        if index['mtime_ns'] != master_corp_path.stat().st_mtime_ns:
+            index['mtime_ns'] = master_corp_path.stat().st_mtime_ns
+            save_master_corp_index(index_path, index)
+        print(f"Read MasterCorp from the cached index {index_path.name}")
+    else:
+        corp_values, availability_rows = read_master_corp_workbook(master_corp_path)
+        stat = master_corp_path.stat()
+        index = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(master_corp_path).hexdigest(),
+            'corp_values': corp_values,
+            'availability_rows': availability_rows,
+        }
+        save_master_corp_index(index_path, index)
+        print(f"Indexed {len(corp_values)} Corp codes and {len(availability_rows)} availabilities from {master_corp_path.name}")
+
+    corp_values = index['corp_values']
+    return MasterCorp(corp_values, frozenset(corp_values), index['availability_rows'])
+
+@timed('validate_event')
+def validate_event(df, csv_file, master_corp, event, download_path, session, streaming=False,
+                   conditional_formatting=False, delta_report=False, export_sheet=True, workbook=True, report_format=None,
+                   history=True, network_future=None):
+    event_name = event['event_name']
+    billing_ids = event['billing_ids']
+    prices = event['prices']
+    tiers = [tier for tier in TIERS if billing_ids[tier]]
+    output_filename = build_output_filename(csv_file, event_name, download_path)
+
+    event_datetime_combined = convert_to_utc(event['broadcast_date'], event['broadcast_time'])
     event_end = event_datetime_combined + timedelta(hours=12.983333333333333)
     date_to_match = event_datetime_combined.strftime('%m/%d/%Y %H.%M.%S')
     event_datetime_combined_iso = event_datetime_combined.strftime('%Y-%m-%dT%H:%MZ')
@@ -352,275 +1504,649 @@ def main():
     print(event_end.strftime('%m/%d/%Y %H.%M.%S'))
     print(f"Formatted datetime for URL: {event_datetime_combined_iso}")
 
-    url = f"http://inspector.merlin.comcast.net:8080/loadGrid?accountId=7876220869746444319&startDate={event_datetime_combined_iso}&clientProfile=XRE:X2&supportedCatalogs=TitleVI,CTV&freeToMe=off"
+    network_executor = None
+    if network_future is None:
+        network_executor = ThreadPoolExecutor(max_workers=1)
+        network_future = start_network_fetch(network_executor, session, event)
+
+    tier_expectations = {
+        tier: {
+            BILLING_COLUMN: billing_ids[tier],
+            PRICE_COLUMN: float(prices[tier]),
+            DATE_COLUMN: date_to_match,
+        }
+        for tier in tiers
+    }
+    corp_values = master_corp.corp_values
+    tier_filters = {tier: (billing_ids[tier], TIER_SOURCE_IDS[tier]) for tier in tiers}
+    tier_frames = filter_tiers(df, tier_filters)
+    tier_checks = {
+        tier: evaluate_tier(tier_frames[tier], billing_ids[tier], float(prices[tier]), date_to_match,
+                            master_corp.corp_codes)
+        for tier in tiers
+    }
+
+    if workbook:
+        original_wb = new_workbook(write_only=streaming)
+        if export_sheet:
+            write_export_sheet(original_wb, df, csv_file)
+            print("Added the PPV export sheet to the workbook")
+
+        build_tier_sheets(original_wb, df, tier_frames, tier_checks, tier_expectations, corp_values,
+                          conditional_formatting)
+        print(f"Copied values from Corp sheet to {', '.join(tiers)} sheets one cell below the last entry in column J")
+
+    with stage('wait_for_network'):
+        grid_listings, tier_offers = network_future.result()
+    if network_executor is not None:
+        network_executor.shutdown()
+
+    if grid_listings:
+        print_ticket_details(event, grid_listings, tier_offers)
+
+    tier_tag_names = {tier: tag_names for tier, (media_guid, tag_names) in tier_offers.items()}
+    if not workbook:
+        reconciliations = reconcile_tier_availabilities(master_corp.availability_rows, tier_tag_names)
+    else:
+        reconciliations = build_availability_sheets(original_wb, tiers, master_corp.availability_rows, tier_tag_names,
+                                                    conditional_formatting)
+        print(f"Copied data from 'Corp Availability' sheet to {', '.join(f'{tier} Availabilities' for tier in tiers)} sheets")
+    print_reconciliations(reconciliations)
+
+    if workbook:
+        with stage('save_workbook'):
+            original_wb.save(output_filename)
+        print(f"Saved the workbook to {output_filename}")
+
+    summary = {'event_name': event_name, 'output_filename': output_filename, 'tiers': {}}
+    if report_format:
+        summary['mismatch_report'] = write_mismatch_report(
+            report_format, output_filename, event, csv_file, date_to_match, tier_frames, tier_checks,
+            reconciliations, grid_listings, tier_offers)
+    if delta_report:
+        summary['delta_report'] = write_delta_report(
+            csv_file, tier_frames, tier_checks, tier_filters, tier_expectations, master_corp.corp_codes, output_filename)
+    for tier in tiers:
+        checks = tier_checks[tier]
+        reconciliation = reconciliations.get(tier, {})
+        summary['tiers'][tier] = {
+            'rows': len(checks),
+            'billing_failures': int((~checks['billing_ok']).sum()),
+            'price_failures': int((~checks['price_ok']).sum()),
+            'date_failures': int((~checks['date_ok']).sum()),
+            'corp_failures': int((~checks['corp_ok']).sum()),
+            'media_guid': tier_offers.get(tier, (None, []))[0],
+            'missing_in_merlin': reconciliation.get('missing_in_merlin', []),
+            'unexpected_in_merlin': reconciliation.get('unexpected_in_merlin', []),
+        }
+    if history:
+        details = ticket_details(event, grid_listings, tier_offers)
+        with run_report_lock:
+            stage_totals = run_report_stage_totals()
+        run = dict(
+            event_name=event_name,
+            export=os.path.basename(csv_file),
+            file_number=export_file_number(csv_file),
+            broadcast_date=event['broadcast_date'],
+            broadcast_time=event['broadcast_time'],
+            date_to_match=date_to_match,
+            validated_at=datetime.now().isoformat(timespec='seconds'),
+            source='run',
+            workbook=os.path.abspath(output_filename) if workbook else None,
+            stages=json.dumps(stage_totals),
+        )
+        tier_results = {
+            tier: (details[tier], tier_frames[tier], tier_checks[tier], reconciliations.get(tier, {}))
+            for tier in tiers
+        }
+        try:
+            summary['history_run_id'] = record_history(download_path, run, tier_results)
+        except sqlite3.Error as error:
+            print(f"Could not record the results in {HISTORY_DB_FILENAME}: {error}")
+    return summary
+
+def get_download_path():
+    download_path = Path.home() / "PPV_Validation_Outputs"
+    download_path.mkdir(exist_ok=True)
+    return download_path
+
+def get_latest_export(download_path, session):
+    if response_cache['replay']:
+        return get_csv_file(download_path)
+    try:
+        return download_latest_csv(EXPORT_INDEX_URL, download_path, session)
+    except requests.RequestException as error:
+        print(f"Could not download the latest CSV file ({error}), using the cached export")
+        return get_csv_file(download_path)
+
+def prefetch_export(download_path, session, validation_only=False):
+    csv_file = get_latest_export(download_path, session)
+    return csv_file, read_export(csv_file, validation_only)
+
+def prompt_event(event_name):
+    billing_ids = {tier: input(f"Enter the {tier} value to match (leave blank to skip): ") for tier in TIERS}
+    prices = {tier: input(f"Enter the {tier} Price (leave blank to skip): ") for tier in TIERS}
+    return {
+        'event_name': event_name,
+        'billing_ids': billing_ids,
+        'prices': prices,
+        'broadcast_date': input("Enter the event broadcast date (e.g., Saturday June 15): "),
+        'broadcast_time': input("Enter the event countdown time (e.g., 7:00p for PM or 7:00a for AM): "),
+    }
+
+def configure_tiers(tier_configs):
+    TIER_CONFIGS[:] = tier_configs
+    TIERS[:] = [tier.label for tier in tier_configs]
+    TIER_SOURCE_IDS.clear()
+    TIER_SOURCE_IDS.update((tier.label, tier.source_id) for tier in tier_configs)
+    GRID_TIERS.clear()
+    GRID_TIERS.update((tier.grid_under, tier.label) for tier in tier_configs)
+
+def load_tier_configs(tiers_path, download_path):
+    if tiers_path is None:
+        tiers_path = Path(download_path) / TIERS_FILENAME
+        if not tiers_path.exists():
+            return list(DEFAULT_TIERS)
+
+    suffix = Path(tiers_path).suffix.lower()
+    with open(tiers_path, 'r') as file:
+        if suffix in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ValueError("PyYAML is required to read YAML tier configs.")
+            records = yaml.safe_load(file)
+        else:
+            records = json.load(file)
+
+    if isinstance(records, dict):
+        records = records.get('tiers', [])
+    try:
+        tier_configs = [
+            TierConfig(str(record['label']), str(record['source_id']), str(record['grid_under']))
+            for record in records
+        ]
+    except KeyError as error:
+        raise ValueError(f"Every tier in {tiers_path} needs a label, source_id and grid_under ({error} is missing).")
+    if not tier_configs:
+        raise ValueError(f"No tiers found in {tiers_path}.")
+    if len({tier.label for tier in tier_configs}) != len(tier_configs):
+        raise ValueError(f"Tier labels in {tiers_path} must be unique.")
+
+    print(f"Loaded {len(tier_configs)} tiers from {tiers_path}: {', '.join(tier.label for tier in tier_configs)}")
+    return tier_configs
+
+def event_from_record(record):
+    return {
+        'event_name': str(record['event_name']),
+        'billing_ids': {tier: str(record.get(f'{tier.lower()}_billing_id') or '') for tier in TIERS},
+        'prices': {tier: str(record.get(f'{tier.lower()}_price') or '') for tier in TIERS},
+        'broadcast_date': str(record['broadcast_date']),
+        'broadcast_time': str(record['broadcast_time']),
+    }
+
+def load_manifest(manifest_path):
+    suffix = Path(manifest_path).suffix.lower()
+    with open(manifest_path, 'r', newline='') as file:
+        if suffix == '.json':
+            records = json.load(file)
+        elif suffix in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ValueError("PyYAML is required to read YAML manifests.")
+            records = yaml.safe_load(file)
+        else:
+            records = list(csv.DictReader(file))
+
+    if isinstance(records, dict):
+        records = records.get('events', [])
+    return [event_from_record(record) for record in records]
+
+batch_state = {}
+
+def init_batch_worker(df, csv_file, master_corp, download_path, trace_memory=False, options=None,
+                      cache_settings=None, tier_configs=DEFAULT_TIERS):
+    if trace_memory:
+        tracemalloc.start()
+    configure_tiers(tier_configs)
+    configure_response_cache(download_path, **(cache_settings or {}))
+    batch_state.update(
+        df=df,
+        csv_file=csv_file,
+        master_corp=master_corp,
+        download_path=download_path,
+        session=create_session(),
+        options=options or {},
+    )
 
-    original_wb = load_workbook(output_filename)
-    
-    if HD_value_to_match:
-        HD_new_sheet = original_wb.create_sheet(title='HD - ' + HD_value_to_match)
-        print("Created HD sheet in the workbook")
-    if SD_value_to_match:
-        SD_new_sheet = original_wb.create_sheet(title='SD - ' + SD_value_to_match)
-        print("Created SD sheet in the workbook")
-    if ES_value_to_match:
-        ES_new_sheet = original_wb.create_sheet(title='ES - ' + ES_value_to_match)
-        print("Created ES sheet in the workbook")
-
-    df = pd.read_excel(output_filename)
-    print("Read data from the Excel")
-
-    if HD_value_to_match:
-        HD_new_sheet.append(df.columns.tolist())
-    if SD_value_to_match:
-        SD_new_sheet.append(df.columns.tolist())
-    if ES_value_to_match:
-        ES_new_sheet.append(df.columns.tolist())
-
-    for index, row in df.iterrows():
-        if HD_value_to_match and row['Billing Event Id'] == HD_value_to_match and row['Source Id'] == int(HD_SID) and not str(row['Corp']).startswith(('8069', '8045')):
-            HD_new_sheet.append(row.tolist())
-        if SD_value_to_match and row['Billing Event Id'] == SD_value_to_match and row['Source Id'] == int(SD_SID) and not str(row['Corp']).startswith(('8069', '8045')):
-            SD_new_sheet.append(row.tolist())
-        if ES_value_to_match and row['Billing Event Id'] == ES_value_to_match and row['Source Id'] == int(ES_SID) and not str(row['Corp']).startswith(('8069', '8045')):
-            ES_new_sheet.append(row.tolist())
-
-    if HD_value_to_match:
-        color_code_cells(HD_new_sheet, 'H', HD_value_to_match, 2)
-        color_code_prices(HD_new_sheet, 'I', float(HD_Price), 2)
-        color_code_dates(HD_new_sheet, 'K', date_to_match, 2)
-    if SD_value_to_match:
-        color_code_cells(SD_new_sheet, 'H', SD_value_to_match, 2)
-        color_code_prices(SD_new_sheet, 'I', float(SD_Price), 2)
-        color_code_dates(SD_new_sheet, 'K', date_to_match, 2)
-    if ES_value_to_match:
-        color_code_cells(ES_new_sheet, 'H', ES_value_to_match, 2)
-        color_code_prices(ES_new_sheet, 'I', float(ES_Price), 2)
-        color_code_dates(ES_new_sheet, 'K', date_to_match, 2)
-
-    if HD_value_to_match:
-        hd_next_row = find_next_empty_row(HD_new_sheet, 'H', 2) + 1
-        HD_new_sheet[f"H{hd_next_row}"] = HD_value_to_match
-        HD_new_sheet[f"H{hd_next_row}"].font = Font(color='006100')
-        HD_new_sheet[f"H{hd_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-        hd_price_next_row = find_next_empty_row(HD_new_sheet, 'I', 2) + 1
-        HD_new_sheet[f"I{hd_price_next_row}"] = float(HD_Price)
-        HD_new_sheet[f"I{hd_price_next_row}"].font = Font(color='006100')
-        HD_new_sheet[f"I{hd_price_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-        hd_date_next_row = find_next_empty_row(HD_new_sheet, 'K', 2) + 1
-        HD_new_sheet[f"K{hd_date_next_row}"] = date_to_match
-        HD_new_sheet[f"K{hd_date_next_row}"].font = Font(color='006100')
-        HD_new_sheet[f"K{hd_date_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-    if SD_value_to_match:
-        sd_next_row = find_next_empty_row(SD_new_sheet, 'H', 2) + 1
-        SD_new_sheet[f"H{sd_next_row}"] = SD_value_to_match
-        SD_new_sheet[f"H{sd_next_row}"].font = Font(color='006100')
-        SD_new_sheet[f"H{sd_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-        sd_price_next_row = find_next_empty_row(SD_new_sheet, 'I', 2) + 1
-        SD_new_sheet[f"I{sd_price_next_row}"] = float(SD_Price)
-        SD_new_sheet[f"I{sd_price_next_row}"].font = Font(color='006100')
-        SD_new_sheet[f"I{sd_price_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-        sd_date_next_row = find_next_empty_row(SD_new_sheet, 'K', 2) + 1
-        SD_new_sheet[f"K{sd_date_next_row}"] = date_to_match
-        SD_new_sheet[f"K{sd_date_next_row}"].font = Font(color='006100')
-        SD_new_sheet[f"K{sd_date_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-    if ES_value_to_match:
-        es_next_row = find_next_empty_row(ES_new_sheet, 'H', 2) + 1
-        ES_new_sheet[f"H{es_next_row}"] = ES_value_to_match
-        ES_new_sheet[f"H{es_next_row}"].font = Font(color='006100')
-        ES_new_sheet[f"H{es_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-        es_price_next_row = find_next_empty_row(ES_new_sheet, 'I', 2) + 1
-        ES_new_sheet[f"I{es_price_next_row}"] = float(ES_Price)
-        ES_new_sheet[f"I{es_price_next_row}"].font = Font(color='006100')
-        ES_new_sheet[f"I{es_price_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-        es_date_next_row = find_next_empty_row(ES_new_sheet, 'K', 2) + 1
-        ES_new_sheet[f"K{es_date_next_row}"] = date_to_match
-        ES_new_sheet[f"K{es_date_next_row}"].font = Font(color='006100')
-        ES_new_sheet[f"K{es_date_next_row}"].fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type="solid")
-
-    master_corp_path = str(download_path / "MasterCorp.xlsx")
-    master_corp_wb = load_workbook(master_corp_path)
-    corp_sheet = master_corp_wb["Corp"]
-    corp_values = [corp_sheet[f"A{i}"].value for i in range(1, 117)]
-
-    if HD_value_to_match:
-        hd_corp_next_row = find_next_empty_row(HD_new_sheet, 'J', 2) + 1
-        for i, value in enumerate(corp_values):
-            HD_new_sheet[f"J{hd_corp_next_row + i}"] = value
-
-    if SD_value_to_match:
-        sd_corp_next_row = find_next_empty_row(SD_new_sheet, 'J', 2) + 1
-        for i, value in enumerate(corp_values):
-            SD_new_sheet[f"J{sd_corp_next_row + i}"] = value
-
-    if ES_value_to_match:
-        es_corp_next_row = find_next_empty_row(ES_new_sheet, 'J', 2) + 1
-        for i, value in enumerate(corp_values):
-            ES_new_sheet[f"J{es_corp_next_row + i}"] = value
-
-    print("Copied values from Corp sheet to HD, SD, and ES sheets one cell below the last entry in column J")
-
-    def compare_and_color_code_both_sheets(hd_sheet, sd_sheet, es_sheet, master_values):
-        good_font_color = '006100'
-        good_fill_color = 'C6EFCE'
-        bad_font_color = '9C0006'
-        bad_fill_color = 'FFC7CE'
-
-        def mark_cell(cell, condition):
-            if condition:
-                cell.font = Font(color=good_font_color)
-                cell.fill = PatternFill(start_color=good_fill_color, end_color=good_fill_color, fill_type="solid")
-            else:
-                cell.font = Font(color=bad_font_color)
-                cell.fill = PatternFill(start_color=bad_fill_color, end_color=bad_fill_color, fill_type="solid")
-
-        if hd_sheet:
-            for row in range(2, hd_sheet.max_row + 1):
-                hd_cell = hd_sheet[f"J{row}"]
-                if hd_cell.value is not None:
-                    mark_cell(hd_cell, hd_cell.value in master_values)
-            for i in range(len(master_values)):
-                hd_copied_cell = hd_sheet[f"J{hd_corp_next_row + i}"]
-                mark_cell(hd_copied_cell, True)
-
-        if sd_sheet:
-            for row in range(2, sd_sheet.max_row + 1):
-                sd_cell = sd_sheet[f"J{row}"]
-                if sd_cell.value is not None:
-                    mark_cell(sd_cell, sd_cell.value in master_values)
-            for i in range(len(master_values)):
-                sd_copied_cell = sd_sheet[f"J{sd_corp_next_row + i}"]
-                mark_cell(sd_copied_cell, True)
-
-        if es_sheet:
-            for row in range(2, es_sheet.max_row + 1):
-                es_cell = es_sheet[f"J{row}"]
-                if es_cell.value is not None:
-                    mark_cell(es_cell, es_cell.value in master_values)
-            for i in range(len(master_values)):
-                es_copied_cell = es_sheet[f"J{es_corp_next_row + i}"]
-                mark_cell(es_copied_cell, True)
-
-    compare_and_color_code_both_sheets(
-        HD_new_sheet if HD_value_to_match else None,
-        SD_new_sheet if SD_value_to_match else None,
-        ES_new_sheet if ES_value_to_match else None,
-        corp_values
+def validate_batch_event(event):
+    reset_run_report()
+    summary = validate_event(
+        batch_state['df'],
+        batch_state['csv_file'],
+        batch_state['master_corp'],
+        event,
+        batch_state['download_path'],
+        batch_state['session'],
+        **batch_state['options'],
     )
+    write_run_report(report_filename(summary['output_filename'], '_report.json'), event_name=event['event_name'])
+    return summary
+
+def start_profiling(trace_memory, profile):
+    if trace_memory:
+        tracemalloc.start()
+    reset_run_report()
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    return profiler
+
+def stop_profiling(profiler, output_filename):
+    if profiler:
+        profiler.disable()
+        profile_filename = report_filename(output_filename, '_profile.prof')
+        profiler.dump_stats(profile_filename)
+        print(f"Wrote the cProfile dump to {profile_filename}")
+
+def run_batch(manifest_path, max_workers=None, trace_memory=False, profile=False, cache_settings=None,
+              validation_only=False, **options):
+    start_time = time.time()
+    profiler = start_profiling(trace_memory, profile)
+
+    events = load_manifest(manifest_path)
+    if not events:
+        raise ValueError(f"No events found in {manifest_path}.")
+
+    download_path = get_download_path()
+    configure_response_cache(download_path, **(cache_settings or {}))
+    session = create_session()
+    csv_file, df = prefetch_export(download_path, session, validation_only)
+    master_corp = load_master_corp(download_path / MASTER_CORP_FILENAME)
+
+    summaries = []
+    max_workers = max_workers or min(len(events), os.cpu_count() or 1)
+    with stage('validate_events'), concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=init_batch_worker,
+        initargs=(df, csv_file, master_corp, download_path, trace_memory, options, cache_settings, TIER_CONFIGS),
+    ) as executor:
+        futures = [(event, executor.submit(validate_batch_event, event)) for event in events]
+        for event, future in futures:
+            try:
+                summaries.append(future.result())
+            except Exception as error:
+                print(f"Validation for {event['event_name']} failed: {error}")
+                summaries.append({'event_name': event['event_name'], 'error': str(error)})
+
+    summary_filename = download_path / f'PPV Batch Summary_{export_file_number(csv_file)}.json'
+    with open(summary_filename, 'w') as file:
+        json.dump({'export': os.path.basename(csv_file), 'events': summaries}, file, indent=2)
+
+    print("\n---Batch summary---")
+    for summary in summaries:
+        if 'error' in summary:
+            print(f"{summary['event_name']}: FAILED ({summary['error']})")
+            continue
+        for tier, result in summary['tiers'].items():
+            print(f"{summary['event_name']} {tier}: {result['rows']} rows, "
+                  f"{result['price_failures']} price, {result['date_failures']} date, "
+                  f"{result['corp_failures']} Corp failures, "
+                  f"{len(result['missing_in_merlin'])} availabilities missing in Merlin")
+    print(f"Wrote the batch summary to {summary_filename}")
+
+    stop_profiling(profiler, summary_filename)
+    write_run_report(report_filename(summary_filename, '_report.json'), manifest=str(manifest_path))
+
+    execution_time = time.time() - start_time
+    print(f"PPV Validation for {len(events)} events was completed in: {execution_time:.2f} seconds")
+
+def load_watch_state(download_path):
+    state_path = Path(download_path) / WATCH_STATE_FILENAME
+    if state_path.exists():
+        with open(state_path, 'r') as file:
+            return json.load(file)
+    return {'index': {}, 'export': None, 'validated': []}
+
+def save_watch_state(download_path, state):
+    state_path = Path(download_path) / WATCH_STATE_FILENAME
+    temp_path = state_path.with_suffix('.tmp')
+    with open(temp_path, 'w') as file:
+        json.dump(state, file, indent=2)
+    os.replace(temp_path, state_path)
+
+def validate_pending_events(manifest_path, df, csv_file, download_path, session, state, **options):
+    pending = [event for event in load_manifest(manifest_path) if event['event_name'] not in state['validated']]
+    if not pending:
+        return 0
+
+    master_corp = load_master_corp(download_path / MASTER_CORP_FILENAME)
+    validated = 0
+    for event in pending:
+        print(f"\n---Validating {event['event_name']} against {os.path.basename(csv_file)}---")
+        reset_run_report()
+        try:
+            summary = validate_event(df, csv_file, master_corp, event, download_path, session, **options)
+            write_run_report(report_filename(summary['output_filename'], '_report.json'), event_name=event['event_name'])
+        except Exception as error:
+            # Left pending so the next check retries it against the same export
+            print(f"Validation for {event['event_name']} failed, retrying on the next check: {error}")
+            continue
+        state['validated'].append(event['event_name'])
+        save_watch_state(download_path, state)
+        validated += 1
+    return validated
+
+def run_watch(manifest_path, cache_settings=None, validation_only=False, **options):
+    download_path = get_download_path()
+    configure_response_cache(download_path, **(cache_settings or {}))
+    session = create_session()
+    state = load_watch_state(download_path)
+    csv_file = df = None
+    interval = WATCH_MIN_INTERVAL
+
+    print(f"Watching {EXPORT_INDEX_URL} for new PPV exports, press Ctrl+C to stop")
+    try:
+        while True:
+            try:
+                index_html, validators = fetch_export_index(EXPORT_INDEX_URL, session, state['index'] if df is not None else None)
+                if index_html is not None:
+                    latest_csv_url = find_latest_csv_url(EXPORT_INDEX_URL, index_html)
+                    if df is None or os.path.basename(latest_csv_url) != os.path.basename(csv_file):
+                        latest_csv_file = download_csv(latest_csv_url, download_path, session)
+                        df = read_export(latest_csv_file, validation_only)
+                        csv_file = latest_csv_file
+                        if state['export'] != os.path.basename(csv_file):
+                            print(f"New PPV export {os.path.basename(csv_file)} is available")
+                            state.update(export=os.path.basename(csv_file), validated=[])
+                    # Only keep the new validators once their export is in hand, so a failed download refetches the index
+                    state['index'] = validators
+                    save_watch_state(download_path, state)
+
+                validated = validate_pending_events(manifest_path, df, csv_file, download_path, session, state, **options)
+                interval = WATCH_MIN_INTERVAL if validated else min(interval * 2, WATCH_MAX_INTERVAL)
+            except (requests.RequestException, ValueError, OSError) as error:
+                print(f"Checking for a new PPV export failed: {error}")
+                interval = min(interval * 2, WATCH_MAX_INTERVAL)
+
+            print(f"Next check for a new PPV export in {interval} seconds")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("Stopped watching for new PPV exports")
+
+def run_download(cache_settings=None):
+    start_time = time.time()
+    download_path = get_download_path()
+    configure_response_cache(download_path, **(cache_settings or {}))
+    csv_file, df = prefetch_export(download_path, create_session())
+    load_master_corp(download_path / MASTER_CORP_FILENAME)
+    print(f"Cached {os.path.basename(csv_file)} ({len(df)} rows) and the MasterCorp index in {time.time() - start_time:.2f} seconds")
+
+def run_query(event_name=None, tier=None, check=None, corp=None, since=None, limit=50, output_format='table'):
+    start_time = time.perf_counter()
+    params = dict(event_name=f'%{event_name}%' if event_name else None, tier=tier, since=since, corp=corp, limit=limit)
+    connection = open_history(get_download_path())
+    try:
+        if corp is not None:
+            rows = [dict(row) for row in connection.execute(HISTORY_CORP_QUERY, params)]
+            timeline = []
+        else:
+            timeline = [dict(row) for row in connection.execute(HISTORY_TIMELINE_QUERY, params)]
+            rows = timeline[-limit:]
+    finally:
+        connection.close()
+
+    keys = {(row['event_name'], row['tier']) for row in timeline}
+    streaks = failing_streaks(timeline, check) if check else {}
+    failing_since = [
+        dict(event_name=event_name, tier=tier, check=check, failing_since=streaks[event_name, tier]['validated_at'],
+             export=streaks[event_name, tier]['export'])
+        for event_name, tier in sorted(keys) if (event_name, tier) in streaks
+    ]
+    if output_format == 'json':
+        print(json.dumps({'rows': rows, 'failing_since': failing_since}, indent=2))
+        return
+
+    print_history_table(rows)
+    if check:
+        for event_name, tier in sorted(keys):
+            streak = streaks.get((event_name, tier))
+            if streak:
+                print(f"{event_name} {tier} {check} checks failing since {streak['validated_at']} ({streak['export']})")
+            else:
+                print(f"{event_name} {tier} {check} checks passed in the latest run")
+    print(f"Answered from {HISTORY_DB_FILENAME} in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+def run_backfill(workbook_paths=None):
+    start_time = time.time()
+    download_path = get_download_path()
+    workbook_paths = workbook_paths or sorted(glob.glob(str(download_path / 'IP PPV *.xlsx')))
+    connection = open_history(download_path)
+    try:
+        recorded = {row['workbook'] for row in connection.execute('SELECT workbook FROM runs WHERE workbook IS NOT NULL')}
+    finally:
+        connection.close()
+
+    backfilled = 0
+    for workbook_path in workbook_paths:
+        if os.path.abspath(workbook_path) in recorded:
+            print(f"{os.path.basename(workbook_path)} is already in the history")
+            continue
+        try:
+            if backfill_workbook(download_path, workbook_path) is not None:
+                backfilled += 1
+        except Exception as error:
+            print(f"Could not backfill {os.path.basename(workbook_path)}: {error}")
+    print(f"Backfilled {backfilled} of {len(workbook_paths)} workbooks into {HISTORY_DB_FILENAME} "
+          f"in {time.time() - start_time:.2f} seconds")
+
+class HeldOutput:
+    # Stands in for sys.stdout while prompting: the main thread writes through, other threads are held back
+    def __init__(self, stream):
+        self.stream = stream
+        self.held = []
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        if threading.current_thread() is threading.main_thread():
+            return self.stream.write(text)
+        with self.lock:
+            if self.held is None:
+                return self.stream.write(text)
+            self.held.append(text)
+        return len(text)
+
+    def release(self):
+        with self.lock:
+            self.stream.write(''.join(self.held))
+            self.held = None
+        self.stream.flush()
+
+    def __getattr__(self, attribute):
+        return getattr(self.stream, attribute)
+
+@contextlib.contextmanager
+def hold_background_output():
+    output = HeldOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        yield
+    finally:
+        sys.stdout = output.stream
+        output.release()
+
+def run_interactive(trace_memory=False, profile=False, cache_settings=None, event=None, event_name=None,
+                    validation_only=False, **options):
+    start_time = time.time()  # Start the timer
+    profiler = start_profiling(trace_memory, profile)
 
-    if HD_value_to_match:
-        HD_availabilities_sheet = original_wb.create_sheet(title='HD Availabilities')
-    if SD_value_to_match:
-        SD_availabilities_sheet = original_wb.create_sheet(title='SD Availabilities')
-    if ES_value_to_match:
-        ES_availabilities_sheet = original_wb.create_sheet(title='ES Availabilities')
-    
-    corp_avail_sheet = master_corp_wb["Corp Availability"]
-    for row in corp_avail_sheet.iter_rows():
-        if HD_value_to_match:
-            HD_availabilities_sheet.append([cell.value for cell in row])
-        if SD_value_to_match:
-            SD_availabilities_sheet.append([cell.value for cell in row])
-        if ES_value_to_match:
-            ES_availabilities_sheet.append([cell.value for cell in row])
-
-    print("Copied data from 'Corp Availability' sheet to 'HD Availabilities', 'SD Availabilities' and 'ES Availabilities' sheets")
-
-    original_wb.save(output_filename)
-    print("Saved the changes to the original workbook\n\n")
-
-    html_content = fetch_html_content(url)
-    if html_content:
-        HD_listing_id, SD_listing_id, HD_program_id, SD_program_id, HD_channel_id, SD_channel_id, HD_station_id, SD_station_id, ES_listing_id, ES_program_id, ES_channel_id, ES_station_id = parse_listing_ids(html_content, event_name)
-
-        if HD_value_to_match and HD_listing_id:
-            HD_url = "http://bo.prod.merlin.ccp.xcal.tv:9023/offerDataService/data/Offer"
-            HD_params = {
-                "schema": "2.34.0",
-                "form": "cjson",
-                "pretty": "true",
-                "byOfferEntityAssociations.entityId": HD_listing_id
-            }
-            HD_settlement_reference = HD_value_to_match
-            HD_Media_Guid = get_media_guid(HD_url, HD_params, HD_settlement_reference)
-
-        if SD_value_to_match and SD_listing_id:
-            SD_url = "http://bo.prod.merlin.ccp.xcal.tv:9023/offerDataService/data/Offer"
-            SD_params = {
-                "schema": "2.34.0",
-                "form": "cjson",
-                "pretty": "true",
-                "byOfferEntityAssociations.entityId": SD_listing_id
-            }
-            SD_settlement_reference = SD_value_to_match
-            SD_Media_Guid = get_media_guid(SD_url, SD_params, SD_settlement_reference)
-            
-        if ES_value_to_match and ES_listing_id:
-            ES_url = "http://bo.prod.merlin.ccp.xcal.tv:9023/offerDataService/data/Offer"
-            ES_params = {
-                "schema": "2.34.0",
-                "form": "cjson",
-                "pretty": "true",
-                "byOfferEntityAssociations.entityId": ES_listing_id
-            }
-            ES_settlement_reference = ES_value_to_match
-            ES_Media_Guid = get_media_guid(ES_url, ES_params, ES_settlement_reference)
-            
-            print(f"---Details for ticket creation---\n")
-            print(f"PPV Validations - {event_name}")
-            print(f"{Event_broadcast_date}\n")
-            print(f"Event time: {Event_broadcast_time}\n")
-            if HD_value_to_match:
-                print(f"HD Price: {HD_Price}")
-            if SD_value_to_match:
-                print(f"SD Price: {SD_Price}")
-            if ES_value_to_match:
-                print(f"ES Price: {ES_Price}\n\n")
-            if HD_value_to_match:
-                print(f"HD: {HD_value_to_match}")
-                print(f"listing_id: {HD_listing_id}")
-                print(f"Program HD ID: {HD_program_id}")
-                print(f"Channel HD ID: {HD_channel_id}")
-                print(f"Station HD ID: {HD_station_id}")
-                print(f"HD_Media_Guid: {HD_Media_Guid}\n\n")
-            if SD_value_to_match:
-                print(f"SD: {SD_value_to_match}")
-                print(f"listing_id: {SD_listing_id}")
-                print(f"Program SD ID: {SD_program_id}")
-                print(f"Channel SD ID: {SD_channel_id}")
-                print(f"Station SD ID: {SD_station_id}")
-                print(f"SD_Media_Guid: {SD_Media_Guid}\n")
-            if ES_value_to_match:
-                print(f"ES: {ES_value_to_match}")
-                print(f"listing_id: {ES_listing_id}")
-                print(f"Program ES ID: {ES_program_id}")
-                print(f"Channel ES ID: {ES_channel_id}")
-                print(f"Station ES ID: {ES_station_id}")
-                print(f"ES_Media_Guid: {ES_Media_Guid}\n")
-
-    hd_guid = HD_Media_Guid if HD_value_to_match else None
-    sd_guid = SD_Media_Guid if SD_value_to_match else None
-    es_guid = ES_Media_Guid if ES_value_to_match else None
-    hd_billing_id = HD_value_to_match if HD_value_to_match else None
-    sd_billing_id = SD_value_to_match if SD_value_to_match else None
-    es_billing_id = ES_value_to_match if ES_value_to_match else None
-
-    filtered_hd_names = fetch_filtered_tag_names(hd_guid, hd_billing_id) if hd_guid and hd_billing_id else []
-    filtered_sd_names = fetch_filtered_tag_names(sd_guid, sd_billing_id) if sd_guid and sd_billing_id else []
-    filtered_es_names = fetch_filtered_tag_names(es_guid, es_billing_id) if es_guid and es_billing_id else []
-
-    update_excel_with_tag_names(output_filename, filtered_hd_names, filtered_sd_names, filtered_es_names)
+    download_path = get_download_path()
+    configure_response_cache(download_path, **(cache_settings or {}))
+    session = create_session()
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix='prefetch') as prefetch:
+        export_future = prefetch.submit(prefetch_export, download_path, session, validation_only)
+        master_corp_future = prefetch.submit(load_master_corp, download_path / MASTER_CORP_FILENAME)
+
+        if event is None:
+            # Prefetch progress is printed after the prompts instead of in the middle of them
+            with hold_background_output():
+                if event_name is None:
+                    with stage('prompt_event_name'):
+                        event_name = input("Enter the event name: ")
+                with stage('prompt_event_details'):
+                    event = prompt_event(event_name)
+        event_name = event['event_name']
+        network_future = start_network_fetch(prefetch, session, event)
+
+        with stage('wait_for_prefetch'):
+            csv_file, df = export_future.result()
+            master_corp = master_corp_future.result()
+
+        summary = validate_event(df, csv_file, master_corp, event, download_path, session,
+                                 network_future=network_future, **options)
+
+    stop_profiling(profiler, summary['output_filename'])
+    write_run_report(report_filename(summary['output_filename'], '_report.json'), event_name=event_name)
 
     end_time = time.time()  # End the timer
     execution_time = end_time - start_time  # Calculate the total execution time
     print(f"PPV Validation for the asset {event_name} was completed in: {execution_time:.2f} seconds")
 
+def option_parsers(argument_default=None):
+    cache_options = argparse.ArgumentParser(add_help=False, argument_default=argument_default)
+    cache_options.add_argument('--cache-ttl', type=int,
+                               help="seconds to reuse cached Merlin responses (0 disables the cache)")
+    cache_options.add_argument('--refresh', action='store_true', help="ignore cached Merlin responses and fetch them again")
+    cache_options.add_argument('--record', metavar='DIR', help="record every Merlin response into DIR for later --replay")
+    cache_options.add_argument('--replay', metavar='DIR',
+                               help="answer Merlin requests only from responses recorded in DIR, without network access")
+    cache_options.add_argument('--tiers', metavar='FILE',
+                               help=f"JSON or YAML tier config (default: {TIERS_FILENAME} in the output folder, else HD/SD/ES)")
+
+    validation_options = argparse.ArgumentParser(add_help=False, argument_default=argument_default)
+    validation_options.add_argument('--trace-memory', action='store_true',
+                                    help="record peak traced memory per stage in the run report")
+    validation_options.add_argument('--profile', action='store_true',
+                                    help="write a cProfile dump next to the output workbook")
+    validation_options.add_argument('--streaming', action='store_true',
+                                    help="write the workbook in openpyxl write-only mode for large exports")
+    validation_options.add_argument('--conditional-formatting', action='store_true',
+                                    help="color the checked columns with Excel conditional formatting rules instead of per-cell styles")
+    validation_options.add_argument('--delta-report', '--delta', action='store_true',
+                                    help="also report the event's rows that flipped between pass and fail since the previous "
+                                         "export (a report only, the export is still validated in full)")
+    validation_options.add_argument('--skip-export-sheet', action='store_true',
+                                    help="leave the raw PPV export sheet out of the workbook")
+    validation_options.add_argument('--report', choices=('json', 'csv'),
+                                    help="write a mismatch report of the failing rows and availabilities next to the workbook")
+    validation_options.add_argument('--no-workbook', action='store_true',
+                                    help="skip the XLSX workbook, e.g. with --report for fast automated checks")
+    validation_options.add_argument('--no-history', action='store_true',
+                                    help=f"do not record the results in {HISTORY_DB_FILENAME}")
+
+    event_options = argparse.ArgumentParser(add_help=False, argument_default=argument_default)
+    event_options.add_argument('--event', metavar='FILE',
+                               help="read the event from a one-event CSV, JSON or YAML file instead of prompting")
+    event_options.add_argument('--event-name', help="event name; prompts for the details unless --date and --time are given")
+    event_options.add_argument('--billing-id', action='append', metavar='TIER=ID', help="billing ID to match for a tier")
+    event_options.add_argument('--price', action='append', metavar='TIER=PRICE', help="price to match for a tier")
+    event_options.add_argument('--date', help="event broadcast date (e.g., Saturday June 15)")
+    event_options.add_argument('--time', help="event countdown time (e.g., 7:00p for PM or 7:00a for AM)")
+    return cache_options, validation_options, event_options
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Validate PPV events against the latest PPV export.",
+                                     parents=option_parsers())
+    parser.set_defaults(cache_ttl=RESPONSE_CACHE_TTL)
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help="validate every event in a CSV, JSON or YAML manifest against one export")
+    parser.add_argument('--workers', type=int, help="number of worker processes for --batch")
+    parser.add_argument('--watch', metavar='MANIFEST',
+                        help="poll for new PPV exports and validate every event in the manifest when one lands")
+
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND',
+                                     description="Without a command the event is validated interactively.")
+    # Subcommand copies leave options given before the command untouched
+    cache_options, validation_options, event_options = option_parsers(argparse.SUPPRESS)
+    commands.add_parser('validate', parents=[cache_options, validation_options, event_options],
+                        help="validate one event given by --event or the event options, prompting for anything missing")
+    batch = commands.add_parser('batch', parents=[cache_options, validation_options],
+                                help="validate every event in a manifest against one export")
+    batch.add_argument('batch', metavar='MANIFEST', help="CSV, JSON or YAML manifest of events")
+    batch.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="number of worker processes")
+    watch = commands.add_parser('watch', parents=[cache_options, validation_options],
+                                help="poll for new PPV exports and validate the manifest when one lands")
+    watch.add_argument('watch', metavar='MANIFEST', help="CSV, JSON or YAML manifest of events")
+    report = commands.add_parser('report', parents=[cache_options, validation_options, event_options],
+                                 help="validate one event headlessly and write only the mismatch report")
+    report.add_argument('--workbook', action='store_true', help="also write the XLSX workbook")
+    commands.add_parser('download', parents=[cache_options],
+                        help="download and cache the latest export and the MasterCorp index, then exit")
+    query = commands.add_parser('query', help=f"answer history and trend questions from {HISTORY_DB_FILENAME}")
+    query.add_argument('--event-name', default=argparse.SUPPRESS, help="only events whose name contains this text")
+    query.add_argument('--tier', help="only this tier, e.g. ES")
+    query.add_argument('--check', choices=HISTORY_CHECKS, help="report since when this check has been failing")
+    query.add_argument('--corp', help="show the per-row history of one Corp code")
+    query.add_argument('--since', help="only runs validated on or after this ISO date, e.g. 2026-06-01")
+    query.add_argument('--limit', type=int, default=50, help="most recent rows to show")
+    query.add_argument('--format', choices=('table', 'json'), default='table', help="output format")
+    backfill = commands.add_parser('backfill', help=f"load past validation workbooks into {HISTORY_DB_FILENAME}")
+    backfill.add_argument('workbooks', nargs='*', metavar='WORKBOOK',
+                          help="workbooks to load (default: every IP PPV *.xlsx in the output folder)")
+    return parser
+
+def tier_values(items):
+    labels = {tier.lower(): tier for tier in TIERS}
+    values = {}
+    for item in items or []:
+        tier, separator, value = item.partition('=')
+        if not separator or tier.lower() not in labels:
+            raise ValueError(f"Expected TIER=VALUE with a tier from {', '.join(TIERS)}, got {item!r}.")
+        values[labels[tier.lower()]] = value
+    return values
+
+def event_from_args(args):
+    if args.event:
+        events = load_manifest(args.event)
+        if len(events) != 1:
+            raise ValueError(f"{args.event} describes {len(events)} events; use the batch command for more than one.")
+        return events[0]
+    if args.event_name is None or args.date is None or args.time is None:
+        return None
+
+    record = {'event_name': args.event_name, 'broadcast_date': args.date, 'broadcast_time': args.time}
+    record.update((f'{tier.lower()}_billing_id', value) for tier, value in tier_values(args.billing_id).items())
+    record.update((f'{tier.lower()}_price', value) for tier, value in tier_values(args.price).items())
+    return event_from_record(record)
+
+def main():
+    args = build_parser().parse_args()
+    if args.command == 'report':
+        args.report = args.report or 'json'
+        args.no_workbook = not args.workbook
+    configure_tiers(load_tier_configs(args.tiers, get_download_path()))
+    cache_settings = dict(ttl=args.cache_ttl, refresh=args.refresh, record=args.record, replay=args.replay)
+    options = dict(
+        streaming=args.streaming,
+        conditional_formatting=args.conditional_formatting,
+        delta_report=args.delta_report,
+        export_sheet=not args.skip_export_sheet,
+        workbook=not args.no_workbook,
+        report_format=args.report,
+        history=not args.no_history,
+    )
+
+    if args.command == 'download':
+        run_download(cache_settings)
+    elif args.command == 'query':
+        run_query(args.event_name, args.tier, args.check, args.corp, args.since, args.limit, args.format)
+    elif args.command == 'backfill':
+        run_backfill(args.workbooks)
+    elif args.watch:
+        run_watch(args.watch, cache_settings, args.no_workbook, **options)
+    elif args.batch:
+        run_batch(args.batch, args.workers, args.trace_memory, args.profile, cache_settings, args.no_workbook, **options)
+    else:
+        run_interactive(args.trace_memory, args.profile, cache_settings, event_from_args(args), args.event_name,
+                        args.no_workbook, **options)
+
 if __name__ == "__main__":
     main()
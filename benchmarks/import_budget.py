@@ -0,0 +1,64 @@
+"""Import-time budget check for the PPV validation script.
+
+Times loading the script module and running `--help` in fresh interpreters,
+subtracts the cost of a bare interpreter start, and fails when either goes
+over budget or when a heavy dependency (pandas, openpyxl, requests, ...)
+is imported before a command needs it.
+
+    python benchmarks/import_budget.py --budget-ms 150
+"""
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+SCRIPT_PATH = Path(__file__).resolve().parent.parent / "AA_AA_PPV VALIDATION V3.0.py"
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'openpyxl', 'requests', 'urllib3', 'bs4', 'lxml', 'pytz', 'yaml']
+
+LOAD_MODULE = f"""
+import sys, importlib.util
+spec = importlib.util.spec_from_file_location('ppv_validation', {str(SCRIPT_PATH)!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))
+"""
+
+
+def best_seconds(command, repeat):
+    best = None
+    output = ''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the PPV validation script's import time against a budget.")
+    parser.add_argument('--budget-ms', type=float, default=150,
+                        help="allowed milliseconds over a bare interpreter start")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    baseline, _ = best_seconds([sys.executable, '-c', 'pass'], args.repeat)
+    import_seconds, loaded = best_seconds([sys.executable, '-c', LOAD_MODULE], args.repeat)
+    help_seconds, _ = best_seconds([sys.executable, str(SCRIPT_PATH), '--help'], args.repeat)
+    loaded = [name for name in loaded.strip().split(',') if name]
+
+    failed = False
+    for name, seconds in (('import', import_seconds), ('--help', help_seconds)):
+        over_baseline_ms = (seconds - baseline) * 1000
+        within_budget = over_baseline_ms <= args.budget_ms
+        failed = failed or not within_budget
+        print(f"{name:<8} {over_baseline_ms:8.1f} ms over a bare interpreter "
+              f"({'ok' if within_budget else 'over'} the {args.budget_ms:.0f} ms budget)")
+    if loaded:
+        failed = True
+        print(f"Heavy modules imported at load time: {', '.join(loaded)}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""Offline benchmark for the PPV validation script.
+
+Generates a synthetic PPV export and MasterCorp.xlsx, serves fake
+vcwh_exports, loadGrid, offerDataService and offerObjects responses from a
+local HTTP server, then times the full pipeline and the individual
+functions. Results are appended to a JSON lines file so runs can be
+compared over time.
+
+    python benchmarks/ppv_benchmark.py --rows 10000,100000 --latency-ms 50
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.util
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from openpyxl import Workbook
+
+SCRIPT_PATH = Path(__file__).resolve().parent.parent / "AA_AA_PPV VALIDATION V3.0.py"
+DEFAULT_RESULTS = Path(__file__).resolve().parent / "results.jsonl"
+
+EXPORT_COLUMNS = [
+    'Event Name', 'Source Id', 'Offer Id', 'Title', 'Rating', 'Genre', 'Status',
+    'Billing Event Id', 'Price', 'Corp', 'Start Date', 'End Date',
+]
+EVENT_NAME = "Benchmark Fight Night"
+TIER_EVENTS = {
+    'HD': ('BENCHHD', '79.99', 'grid-under-504'),
+    'SD': ('BENCHSD', '69.99', 'grid-under-501'),
+    'ES': ('BENCHES', '59.99', 'grid-under-502'),
+}
+CORP_CODES = [8000000 + i for i in range(116)]
+AVAILABILITY_TAGS = [f"Corp:{code}" for code in CORP_CODES[:100]]
+
+
+def load_validation_module():
+    spec = importlib.util.spec_from_file_location('ppv_validation', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['ppv_validation'] = module
+    spec.loader.exec_module(module)
+    return module
+
+def benchmark_event():
+    event_date = datetime(datetime.now().year, 6, 15).strftime('%A %B %d')
+    return {
+        'event_name': EVENT_NAME,
+        'billing_ids': {tier: billing_id for tier, (billing_id, _, _) in TIER_EVENTS.items()},
+        'prices': {tier: price for tier, (_, price, _) in TIER_EVENTS.items()},
+        'broadcast_date': event_date,
+        'broadcast_time': '7:00p',
+    }
+
+def generate_export(path, rows, date_to_match, tier_source_ids, seed=0):
+    rng = np.random.default_rng(seed)
+    source_ids = [int(tier_source_ids[tier]) for tier in TIER_EVENTS] + [10000]
+    billing_ids = [billing_id for billing_id, _, _ in TIER_EVENTS.values()] + ['OTHER']
+    prices = [float(price) for _, price, _ in TIER_EVENTS.values()] + [9.99]
+    corps = np.array(CORP_CODES + [8069001, 8045002, 7000001], dtype=np.int64)
+    row_ids = np.arange(rows)
+
+    frame = pd.DataFrame({
+        'Event Name': np.char.add('Event ', row_ids.astype(str)),
+        'Source Id': rng.choice(source_ids, rows),
+        'Offer Id': np.char.add('O', row_ids.astype(str)),
+        'Title': 'Title',
+        'Rating': 'TV-14',
+        'Genre': 'Sports',
+        'Status': 'Active',
+        'Billing Event Id': rng.choice(billing_ids, rows),
+        'Price': rng.choice(prices, rows),
+        'Corp': rng.choice(corps, rows),
+        'Start Date': rng.choice([date_to_match, '01/01/2000 00.00.00'], rows, p=[0.9, 0.1]),
+        'End Date': '01/01/2000 12.59.00',
+    }, columns=EXPORT_COLUMNS)
+    frame.to_csv(path, index=False)
+
+def generate_master_corp(path):
+    wb = Workbook()
+    corp_sheet = wb.active
+    corp_sheet.title = "Corp"
+    for code in CORP_CODES:
+        corp_sheet.append([code])
+    availability_sheet = wb.create_sheet("Corp Availability")
+    for tag_name in AVAILABILITY_TAGS:
+        availability_sheet.append([tag_name])
+    wb.save(path)
+
+def generate_grid_html(noise_listings):
+    anchors = []
+    for tier, (billing_id, _, grid_under) in TIER_EVENTS.items():
+        anchors.append(
+            f'<a data-grid-under="{grid_under}" data-listingid="L-{billing_id}" data-merlinid="P-{billing_id}" '
+            f'data-stationid="S-{tier}" data-channelid="C-{tier}">{EVENT_NAME} ({tier})</a>'
+        )
+    grid_unders = [grid_under for _, _, grid_under in TIER_EVENTS.values()]
+    for i in range(noise_listings):
+        anchors.append(
+            f'<div class="cell"><a data-grid-under="{grid_unders[i % 3]}" data-listingid="N{i}" '
+            f'data-merlinid="NP{i}" data-stationid="NS{i}" data-channelid="NC{i}"><span>Program {i}</span></a></div>'
+        )
+    return f"<html><body>{''.join(anchors)}</body></html>"
+
+def offer_response(listing_ids):
+    entries = []
+    for listing_id in listing_ids:
+        settlement_reference = listing_id[2:] if listing_id.startswith('L-') else 'UNRELATED'
+        entries.append({
+            'id': listing_id,
+            'offerMediaAssociations': [
+                {'settlementReference': 'UNRELATED', 'mediaId': {'mediaGuid': 'GUID-UNRELATED'}},
+                {'settlementReference': settlement_reference, 'mediaId': {'mediaGuid': f'GUID-{settlement_reference}'}},
+            ],
+        })
+    return {'entries': entries}
+
+def offer_objects_response(guid):
+    billing_id = guid.replace('GUID-', '')
+    availabilities = [{'availabilityTagName': f"Corp:{code}"} for code in CORP_CODES[5:110]]
+    availabilities += [{'availabilityTagName': 'Corp:8069001'}, {'availabilityTagName': 'Region:East'}]
+    return {'offers': [
+        {'billingId': billing_id, 'availabilities': availabilities},
+        {'billingId': 'UNRELATED', 'availabilities': availabilities},
+    ]}
+
+class MerlinStandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type, headers=None):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        config = self.server.config
+        time.sleep(config['latency_ms'] / 1000)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path.startswith('/vcwh_exports/ppv/') and url.path.endswith('.csv'):
+            export_path = config['data_dir'] / os.path.basename(url.path)
+            etag = f'"{export_path.stat().st_mtime_ns}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_body(export_path.read_bytes(), 'text/csv', {'ETag': etag})
+        elif url.path.startswith('/vcwh_exports/ppv'):
+            links = ''.join(f'<a href="{path.name}">{path.name}</a>' for path in sorted(config['data_dir'].glob('*.csv')))
+            self.send_body(f"<html><body>{links}</body></html>".encode(), 'text/html')
+        elif url.path == '/loadGrid':
+            self.send_body(config['grid_html'].encode(), 'text/html')
+        elif url.path.endswith('/Offer'):
+            listing_ids = []
+            for value in query.get('byOfferEntityAssociations.entityId', []):
+                listing_ids.extend(value.split(','))
+            self.send_body(json.dumps(offer_response(listing_ids)).encode(), 'application/json')
+        elif url.path == '/offerObjects':
+            self.send_body(json.dumps(offer_objects_response(query['guid'][0])).encode(), 'application/json')
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+def start_server(data_dir, grid_html, latency_ms):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MerlinStandInHandler)
+    server.config = {'data_dir': data_dir, 'grid_html': grid_html, 'latency_ms': latency_ms}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def point_module_at(module, base_url, download_path):
+    module.EXPORT_INDEX_URL = f"{base_url}/vcwh_exports/ppv/"
+    module.MERLIN_INSPECTOR_URL = base_url
+    module.OFFER_URL = f"{base_url}/offerDataService/data/Offer"
+    module.get_download_path = lambda: download_path
+
+def best_of(repeat, function):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return round(min(timings), 6), result
+
+def run_end_to_end(module, download_path, event, streaming=False):
+    module.reset_run_report()
+    session = module.create_session()
+    start = time.perf_counter()
+    csv_file = module.get_latest_export(download_path, session)
+    df = module.read_export(csv_file)
+    master_corp = module.load_master_corp(download_path / module.MASTER_CORP_FILENAME)
+    module.validate_event(df, csv_file, master_corp, event, download_path, session, streaming=streaming)
+    total_seconds = time.perf_counter() - start
+
+    stage_totals = {}
+    for record in module.run_report['stages']:
+        stage_totals[record['name']] = round(stage_totals.get(record['name'], 0) + record['seconds'], 6)
+    return {'total_seconds': round(total_seconds, 6), 'stages': stage_totals, 'http': module.run_report['http']}
+
+def run_function_benchmarks(module, download_path, event, repeat):
+    session = module.create_session()
+    csv_file = module.get_csv_file(download_path)
+    cache_path = module.columnar_cache_path(csv_file)
+    results = {}
+
+    def read_uncached():
+        if cache_path.exists():
+            cache_path.unlink()
+        return module.read_export(csv_file)
+
+    results['read_export (csv)'], df = best_of(repeat, read_uncached)
+    results['read_export (cached)'], df = best_of(repeat, lambda: module.read_export(csv_file))
+
+    def write_export():
+        wb = module.new_workbook()
+        module.write_export_sheet(wb, df, csv_file)
+        return wb
+    results['write_export_sheet'], _ = best_of(repeat, write_export)
+
+    tier_filters = {tier: (event['billing_ids'][tier], module.TIER_SOURCE_IDS[tier]) for tier in TIER_EVENTS}
+    results['filter_tiers'], tier_frames = best_of(repeat, lambda: module.filter_tiers(df, tier_filters))
+
+    date_to_match = module.convert_to_utc(event['broadcast_date'], event['broadcast_time']).strftime('%m/%d/%Y %H.%M.%S')
+    tier_expectations = {
+        tier: {
+            module.BILLING_COLUMN: event['billing_ids'][tier],
+            module.PRICE_COLUMN: float(event['prices'][tier]),
+            module.DATE_COLUMN: date_to_match,
+        }
+        for tier in TIER_EVENTS
+    }
+    master_corp = module.load_master_corp(download_path / module.MASTER_CORP_FILENAME)
+    tier_checks = {
+        tier: module.evaluate_tier(tier_frames[tier], expected[module.BILLING_COLUMN], expected[module.PRICE_COLUMN],
+                                   date_to_match, master_corp.corp_codes)
+        for tier, expected in tier_expectations.items()
+    }
+    results['build_tier_sheets'], _ = best_of(repeat, lambda: module.build_tier_sheets(
+        module.new_workbook(), df, tier_frames, tier_checks, tier_expectations, master_corp.corp_values))
+
+    grid_html = module.fetch_html_content(f"{module.MERLIN_INSPECTOR_URL}/loadGrid", session)
+    results['parse_listing_ids'], grid_listings = best_of(repeat, lambda: module.parse_listing_ids(grid_html, event['event_name']))
+
+    listing_ids = [listing_id for tier in TIER_EVENTS for listing_id in grid_listings[tier].listing_ids]
+    results['get_media_guids'], media_guids = best_of(
+        repeat, lambda: module.get_media_guids(session, listing_ids, event['billing_ids']))
+    media_guid = media_guids.get('HD')
+    billing_id = event['billing_ids']['HD']
+    results['fetch_filtered_tag_names'], _ = best_of(
+        repeat, lambda: module.fetch_filtered_tag_names(media_guid, billing_id, session))
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_PATH.parent,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def previous_result(results_path, rows, latency_ms, streaming=False):
+    if not results_path.exists():
+        return None
+    previous = None
+    with open(results_path) as file:
+        for line in file:
+            record = json.loads(line)
+            if (record['rows'] == rows and record['latency_ms'] == latency_ms
+                    and record.get('streaming', False) == streaming):
+                previous = record
+    return previous
+
+def print_comparison(label, current, previous):
+    if previous is None:
+        print(f"  {label:<32} {current:>10.4f}s")
+        return
+    change = (current - previous) / previous * 100 if previous else 0.0
+    print(f"  {label:<32} {current:>10.4f}s  (was {previous:.4f}s, {change:+.1f}%)")
+
+def run_benchmark(module, rows, latency_ms, noise_listings, repeat, workdir, streaming=False):
+    data_dir = workdir / 'server'
+    download_path = workdir / 'PPV_Validation_Outputs'
+    for path in (data_dir, download_path):
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+
+    event = benchmark_event()
+    date_to_match = module.convert_to_utc(event['broadcast_date'], event['broadcast_time']).strftime('%m/%d/%Y %H.%M.%S')
+    generate_export(data_dir / f'ppv_export_daily_full_{rows}.csv', rows, date_to_match, module.TIER_SOURCE_IDS)
+    generate_master_corp(download_path / module.MASTER_CORP_FILENAME)
+
+    server = start_server(data_dir, generate_grid_html(noise_listings), latency_ms)
+    try:
+        point_module_at(module, f"http://127.0.0.1:{server.server_address[1]}", download_path)
+        end_to_end = run_end_to_end(module, download_path, event, streaming)
+        functions = run_function_benchmarks(module, download_path, event, repeat)
+    finally:
+        server.shutdown()
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'rows': rows,
+        'latency_ms': latency_ms,
+        'noise_listings': noise_listings,
+        'streaming': streaming,
+        'end_to_end': end_to_end,
+        'functions': functions,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PPV validation pipeline offline.")
+    parser.add_argument('--rows', default='10000',
+                        help="comma-separated synthetic export sizes, e.g. 10000,100000,5000000")
+    parser.add_argument('--latency-ms', type=float, default=25, help="latency added to every stand-in response")
+    parser.add_argument('--noise-listings', type=int, default=2000, help="unrelated anchors in the loadGrid page")
+    parser.add_argument('--repeat', type=int, default=3, help="repetitions per function benchmark (best is kept)")
+    parser.add_argument('--results', type=Path, default=DEFAULT_RESULTS, help="JSON lines file to append results to")
+    parser.add_argument('--workdir', type=Path, help="working directory (default: a temporary directory)")
+    parser.add_argument('--streaming', action='store_true', help="write the workbook in write-only mode end to end")
+    args = parser.parse_args()
+
+    module = load_validation_module()
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix='ppv_benchmark_'))
+    for rows in (int(value) for value in args.rows.split(',')):
+        previous = previous_result(args.results, rows, args.latency_ms, args.streaming)
+        print(f"Benchmarking {rows} rows with {args.latency_ms} ms service latency")
+        result = run_benchmark(module, rows, args.latency_ms, args.noise_listings, args.repeat, workdir, args.streaming)
+
+        print(f"\n{rows} rows - end to end")
+        print_comparison('total', result['end_to_end']['total_seconds'],
+                         previous and previous['end_to_end']['total_seconds'])
+        for name, seconds in result['end_to_end']['stages'].items():
+            print_comparison(name, seconds, previous and previous['end_to_end']['stages'].get(name))
+        print(f"{rows} rows - functions (best of {args.repeat})")
+        for name, seconds in result['functions'].items():
+            print_comparison(name, seconds, previous and previous['functions'].get(name))
+
+        with open(args.results, 'a') as file:
+            file.write(json.dumps(result) + '\n')
+    print(f"\nAppended results to {args.results}")
+
+    if args.workdir is None:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()